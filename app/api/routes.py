@@ -2,17 +2,27 @@
 REST API routes for the Voltaro dashboard frontend.
 """
 
+import asyncio
 from datetime import datetime
 from typing import List, Optional
 from fastapi import APIRouter, HTTPException, Depends
-from pydantic import BaseModel
-from sqlalchemy import select, desc
+from fastapi.responses import ORJSONResponse
+from pydantic import BaseModel, ConfigDict
+from sqlalchemy import String, any_, bindparam, desc, func, select, tuple_
+from sqlalchemy.dialects.postgresql import ARRAY, insert as pg_insert
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from app.cache import TTLCache
+from app.config import DASHBOARD_STATS_TTL
 from app.database import AsyncSessionLocal
 from app.models import ChargePoint, Session, IdTag, ConnectorStatus
 from app.central_system import CentralSystem
-from app.connection_manager import is_charge_point_connected
+from app.id_tags import invalidate_id_tag
+from app.connection_manager import (
+    get_connected_charge_point_id_set,
+    get_connected_charge_point_ids,
+    is_charge_point_connected,
+)
 
 
 # Pydantic models for API requests/responses
@@ -34,8 +44,7 @@ class ChargePointResponse(BaseModel):
     last_seen: Optional[datetime]
     created_at: datetime
 
-    class Config:
-        from_attributes = True
+    model_config = ConfigDict(from_attributes=True)
 
 
 class SessionResponse(BaseModel):
@@ -49,8 +58,7 @@ class SessionResponse(BaseModel):
     energy_consumed: Optional[float]
     cost: Optional[float]
 
-    class Config:
-        from_attributes = True
+    model_config = ConfigDict(from_attributes=True)
 
 
 class RemoteStartRequest(BaseModel):
@@ -70,37 +78,132 @@ class DashboardStats(BaseModel):
     total_fees_collected: float
 
 
-# Dependency to get database session
+# Columns backing the list responses. List endpoints select just these and
+# serialize the rows directly: values come straight from typed DB columns, so
+# re-validating them against the response models is wasted work (the models
+# still document the response shape). is_online comes from live connections.
+_CHARGE_POINT_RESPONSE_COLUMNS = (
+    ChargePoint.id,
+    ChargePoint.vendor,
+    ChargePoint.model,
+    ChargePoint.status,
+    ChargePoint.last_seen,
+    ChargePoint.created_at,
+)
+_SESSION_RESPONSE_COLUMNS = (
+    Session.id,
+    Session.transaction_id,
+    Session.charge_point_id,
+    Session.connector_id,
+    Session.status,
+    Session.start_timestamp,
+    Session.stop_timestamp,
+    Session.energy_consumed,
+    Session.cost,
+)
+
+# Statements built once at import; handlers only bind parameters or add the
+# optional filters, so each request skips rebuilding the query construct
+# List pages are ordered by (timestamp, id) so the keyset cursor is unique
+# even when rows share a timestamp
+_CHARGE_POINT_LIST_STMT = select(*_CHARGE_POINT_RESPONSE_COLUMNS).order_by(
+    ChargePoint.created_at.desc(), ChargePoint.id.desc()
+)
+_SESSION_LIST_STMT = select(*_SESSION_RESPONSE_COLUMNS).order_by(
+    desc(Session.start_timestamp), desc(Session.id)
+)
+_completed = Session.status == "Completed"
+_SESSION_STATS_STMT = select(
+    func.count(Session.id).filter(Session.status == "Active"),
+    func.coalesce(func.sum(Session.energy_consumed).filter(_completed), 0),
+    func.coalesce(func.sum(Session.cost).filter(_completed), 0),
+)
+# The connected ids are bound as one array, so the SQL (and its prepared
+# statement) is the same for any number of connections
+_CHARGE_POINT_COUNTS_STMT = select(
+    func.count(ChargePoint.id),
+    func.count(ChargePoint.id).filter(
+        ChargePoint.id == any_(bindparam("connected_ids", type_=ARRAY(String)))
+    ),
+)
+_ACCEPTED_ID_TAGS_STMT = (
+    select(IdTag).where(IdTag.status == "Accepted").order_by(IdTag.created_at.desc())
+)
+_ID_TAG_EXISTS_STMT = select(IdTag.id).where(IdTag.tag == bindparam("tag"))
+
+
+# Dependency to get database session; the context manager returns the
+# connection to the pool, so no explicit close is needed
 async def get_db():
     async with AsyncSessionLocal() as session:
-        try:
-            yield session
-        finally:
-            await session.close()
+        yield session
+
+
+def _page_response(rows: list, limit: Optional[int], timestamp_key: str):
+    """
+    Return a list page as JSON; a full page carries the next page's cursor.
+
+    The cursor is the last row's timestamp and id, sent in the X-Next-Before
+    and X-Next-Before-Id headers, to pass back as before and before_id.
+    """
+    headers = None
+    if limit and len(rows) == limit:
+        last = rows[-1]
+        headers = {
+            "X-Next-Before": last[timestamp_key].isoformat(),
+            "X-Next-Before-Id": str(last["id"]),
+        }
+    return ORJSONResponse(rows, headers=headers)
+
 
+def _check_cursor(before: Optional[datetime], before_id) -> None:
+    """Reject a before_id without before, which would restart from page one."""
+    if before_id is not None and before is None:
+        raise HTTPException(
+            status_code=400, detail="before_id requires before to be set"
+        )
+
+
+# Short-lived cache so polling dashboards don't recompute stats per request
+_dashboard_stats_cache = TTLCache(maxsize=1, ttl=DASHBOARD_STATS_TTL)
 
 # Create router
 router = APIRouter(prefix="/api", tags=["voltaro-api"])
 
 
 @router.get("/charge-points", response_model=List[ChargePointResponse])
-async def get_charge_points(db: AsyncSession = Depends(get_db)):
-    """Get all charge points with their current status."""
-    try:
-        result = await db.execute(
-            select(ChargePoint).order_by(ChargePoint.created_at.desc())
+async def get_charge_points(
+    limit: Optional[int] = None,
+    before: Optional[datetime] = None,
+    before_id: Optional[str] = None,
+    db: AsyncSession = Depends(get_db),
+):
+    """
+    Get charge points with their current status, newest first.
+
+    Pass limit to page through large fleets. A full page returns the cursor
+    for the next one in the X-Next-Before / X-Next-Before-Id headers; pass
+    them back as before and before_id.
+    """
+    _check_cursor(before, before_id)
+    query = _CHARGE_POINT_LIST_STMT.limit(limit)
+
+    if before and before_id is not None:
+        query = query.where(
+            tuple_(ChargePoint.created_at, ChargePoint.id) < (before, before_id)
         )
-        charge_points = result.scalars().all()
+    elif before:
+        query = query.where(ChargePoint.created_at < before)
 
-        # Update connection status from in-memory connections
-        for cp in charge_points:
-            cp.is_online = is_charge_point_connected(cp.id)
+    result = await db.execute(query)
 
-        return charge_points
-    except Exception as e:
-        raise HTTPException(
-            status_code=500, detail=f"Failed to fetch charge points: {str(e)}"
-        )
+    # Connection status comes from in-memory connections
+    connected_ids = get_connected_charge_point_id_set()
+    return _page_response(
+        [{**row, "is_online": row["id"] in connected_ids} for row in result.mappings()],
+        limit,
+        "created_at",
+    )
 
 
 @router.post("/charge-points", response_model=ChargePointResponse)
@@ -108,17 +211,12 @@ async def create_charge_point(
     charge_point: ChargePointCreate, db: AsyncSession = Depends(get_db)
 ):
     """Create a new charge point."""
-    try:
-        # Check if charge point already exists
-        existing = await db.get(ChargePoint, charge_point.id)
-        if existing:
-            raise HTTPException(
-                status_code=400,
-                detail=f"Charge point with ID '{charge_point.id}' already exists",
-            )
-
-        # Create new charge point
-        new_cp = ChargePoint(
+    # Single INSERT ... ON CONFLICT DO NOTHING RETURNING round-trip: no
+    # row back means the charge point already exists. This also closes
+    # the race between a separate existence check and the insert.
+    stmt = (
+        pg_insert(ChargePoint)
+        .values(
             id=charge_point.id,
             vendor=charge_point.vendor,
             model=charge_point.model,
@@ -129,180 +227,162 @@ async def create_charge_point(
             is_online=False,
             boot_status="Pending",
         )
-
-        db.add(new_cp)
-        await db.commit()
-        await db.refresh(new_cp)
-
-        return new_cp
-    except HTTPException:
-        raise
-    except Exception as e:
-        await db.rollback()
+        .on_conflict_do_nothing(index_elements=[ChargePoint.id])
+        .returning(ChargePoint)
+    )
+    new_cp = (await db.execute(stmt)).scalar_one_or_none()
+    if new_cp is None:
         raise HTTPException(
-            status_code=500, detail=f"Failed to create charge point: {str(e)}"
+            status_code=400,
+            detail=f"Charge point with ID '{charge_point.id}' already exists",
         )
 
+    await db.commit()
+
+    return new_cp
+
 
 @router.get("/charge-points/{charge_point_id}", response_model=ChargePointResponse)
 async def get_charge_point(charge_point_id: str, db: AsyncSession = Depends(get_db)):
     """Get a specific charge point by ID."""
-    try:
-        charge_point = await db.get(ChargePoint, charge_point_id)
-        if not charge_point:
-            raise HTTPException(status_code=404, detail="Charge point not found")
-
-        # Update connection status
-        charge_point.is_online = is_charge_point_connected(charge_point_id)
-
-        return charge_point
-    except HTTPException:
-        raise
-    except Exception as e:
-        raise HTTPException(
-            status_code=500, detail=f"Failed to fetch charge point: {str(e)}"
-        )
+    charge_point = await db.get(ChargePoint, charge_point_id)
+    if not charge_point:
+        raise HTTPException(status_code=404, detail="Charge point not found")
 
+    # Update connection status
+    charge_point.is_online = is_charge_point_connected(charge_point_id)
 
-@router.post("/charge-points/{charge_point_id}/start-transaction")
-async def remote_start_transaction(charge_point_id: str, request: RemoteStartRequest):
-    """Start a charging transaction remotely."""
-    try:
-        result = await CentralSystem.remote_start_transaction(
-            charge_point_id=charge_point_id,
-            id_tag=request.id_tag,
-            connector_id=request.connector_id,
-        )
+    return charge_point
 
-        if not result["success"]:
-            raise HTTPException(
-                status_code=400, detail=result.get("error", "Remote start failed")
-            )
 
-        return result
-    except HTTPException:
-        raise
-    except Exception as e:
+@router.post("/charge-points/{charge_point_id}/start-transaction")
+async def remote_start_transaction(
+    charge_point_id: str,
+    request: RemoteStartRequest,
+    db: AsyncSession = Depends(get_db),
+):
+    """Start a charging transaction remotely."""
+    result = await CentralSystem.remote_start_transaction(
+        charge_point_id=charge_point_id,
+        id_tag=request.id_tag,
+        connector_id=request.connector_id,
+        session=db,
+    )
+
+    if not result["success"]:
         raise HTTPException(
-            status_code=500, detail=f"Failed to start transaction: {str(e)}"
+            status_code=400, detail=result.get("error", "Remote start failed")
         )
 
+    return result
+
 
 @router.post("/charge-points/{charge_point_id}/stop-transaction")
-async def remote_stop_transaction(charge_point_id: str, request: RemoteStopRequest):
+async def remote_stop_transaction(
+    charge_point_id: str,
+    request: RemoteStopRequest,
+    db: AsyncSession = Depends(get_db),
+):
     """Stop a charging transaction remotely."""
-    try:
-        result = await CentralSystem.remote_stop_transaction(
-            charge_point_id=charge_point_id, transaction_id=request.transaction_id
-        )
+    result = await CentralSystem.remote_stop_transaction(
+        charge_point_id=charge_point_id,
+        transaction_id=request.transaction_id,
+        session=db,
+    )
 
-        if not result["success"]:
-            raise HTTPException(
-                status_code=400, detail=result.get("error", "Remote stop failed")
-            )
-
-        return result
-    except HTTPException:
-        raise
-    except Exception as e:
+    if not result["success"]:
         raise HTTPException(
-            status_code=500, detail=f"Failed to stop transaction: {str(e)}"
+            status_code=400, detail=result.get("error", "Remote stop failed")
         )
 
+    return result
+
 
 @router.get("/sessions", response_model=List[SessionResponse])
 async def get_sessions(
     limit: int = 50,
     charge_point_id: Optional[str] = None,
+    before: Optional[datetime] = None,
+    before_id: Optional[int] = None,
     db: AsyncSession = Depends(get_db),
 ):
-    """Get recent charging sessions."""
-    try:
-        query = select(Session).order_by(desc(Session.start_timestamp)).limit(limit)
+    """
+    Get recent charging sessions, newest first.
 
-        if charge_point_id:
-            query = query.where(Session.charge_point_id == charge_point_id)
+    A full page returns the cursor for the next one in the X-Next-Before /
+    X-Next-Before-Id headers; pass them back as before and before_id.
+    """
+    _check_cursor(before, before_id)
+    query = _SESSION_LIST_STMT.limit(limit)
 
-        result = await db.execute(query)
-        sessions = result.scalars().all()
+    if charge_point_id:
+        query = query.where(Session.charge_point_id == charge_point_id)
 
-        return sessions
-    except Exception as e:
-        raise HTTPException(
-            status_code=500, detail=f"Failed to fetch sessions: {str(e)}"
+    if before and before_id is not None:
+        query = query.where(
+            tuple_(Session.start_timestamp, Session.id) < (before, before_id)
+        )
+    elif before:
+        query = query.where(Session.start_timestamp < before)
+
+    result = await db.execute(query)
+
+    return _page_response(
+        [dict(row) for row in result.mappings()], limit, "start_timestamp"
+    )
+
+
+async def _compute_dashboard_stats():
+    """Compute dashboard statistics from the database and live connections."""
+    # Session counts and totals come from a single aggregate query, and charge
+    # points plus those with a live in-memory connection are counted in SQL.
+    # The two queries are independent, so run them concurrently; a single
+    # AsyncSession cannot multiplex queries
+    async with AsyncSessionLocal() as cp_db, AsyncSessionLocal() as stats_db:
+        cp_result, stats_result = await asyncio.gather(
+            cp_db.execute(
+                _CHARGE_POINT_COUNTS_STMT,
+                {"connected_ids": list(get_connected_charge_point_ids())},
+            ),
+            stats_db.execute(_SESSION_STATS_STMT),
         )
 
+    total_charge_points, online_count = cp_result.one()
+    active_sessions, total_energy, total_fees = stats_result.one()
 
-@router.get("/dashboard/stats", response_model=DashboardStats)
-async def get_dashboard_stats(db: AsyncSession = Depends(get_db)):
-    """Get dashboard statistics."""
-    try:
-        # Count total charge points
-        cp_result = await db.execute(select(ChargePoint))
-        all_charge_points = cp_result.scalars().all()
-        total_charge_points = len(all_charge_points)
-
-        # Count online charge points (check in-memory connections)
-        online_count = 0
-        for cp in all_charge_points:
-            if is_charge_point_connected(cp.id):
-                online_count += 1
-
-        # Count active sessions
-        active_sessions_result = await db.execute(
-            select(Session).where(Session.status == "Active")
-        )
-        active_sessions = len(active_sessions_result.scalars().all())
+    return DashboardStats(
+        total_charge_points=total_charge_points,
+        online_charge_points=online_count,
+        active_sessions=active_sessions,
+        total_energy_consumed=total_energy,
+        total_fees_collected=total_fees,
+    )
 
-        # Calculate total energy and fees from completed sessions
-        completed_sessions_result = await db.execute(
-            select(Session).where(Session.status == "Completed")
-        )
-        completed_sessions = completed_sessions_result.scalars().all()
 
-        total_energy = sum(
-            session.energy_consumed or 0 for session in completed_sessions
-        )
-        total_fees = sum(session.cost or 0 for session in completed_sessions)
-
-        return DashboardStats(
-            total_charge_points=total_charge_points,
-            online_charge_points=online_count,
-            active_sessions=active_sessions,
-            total_energy_consumed=total_energy,
-            total_fees_collected=total_fees,
-        )
-    except Exception as e:
-        raise HTTPException(
-            status_code=500, detail=f"Failed to fetch dashboard stats: {str(e)}"
-        )
+@router.get("/dashboard/stats", response_model=DashboardStats)
+async def get_dashboard_stats():
+    """Get dashboard statistics, cached briefly since clients poll this."""
+    return await _dashboard_stats_cache.get_or_compute(
+        "stats", _compute_dashboard_stats
+    )
 
 
 @router.get("/id-tags", response_model=List[dict])
 async def get_id_tags(db: AsyncSession = Depends(get_db)):
     """Get all ID tags for transaction authorization."""
-    try:
-        result = await db.execute(
-            select(IdTag)
-            .where(IdTag.status == "Accepted")
-            .order_by(IdTag.created_at.desc())
-        )
-        id_tags = result.scalars().all()
-
-        return [
-            {
-                "id": tag.id,
-                "tag": tag.tag,
-                "user_name": tag.user_name,
-                "user_email": tag.user_email,
-                "status": tag.status,
-            }
-            for tag in id_tags
-        ]
-    except Exception as e:
-        raise HTTPException(
-            status_code=500, detail=f"Failed to fetch ID tags: {str(e)}"
-        )
+    result = await db.execute(_ACCEPTED_ID_TAGS_STMT)
+    id_tags = result.scalars().all()
+
+    return [
+        {
+            "id": tag.id,
+            "tag": tag.tag,
+            "user_name": tag.user_name,
+            "user_email": tag.user_email,
+            "status": tag.status,
+        }
+        for tag in id_tags
+    ]
 
 
 @router.post("/id-tags")
@@ -313,32 +393,26 @@ async def create_id_tag(
     db: AsyncSession = Depends(get_db),
 ):
     """Create a new ID tag for testing purposes."""
-    try:
-        # Check if tag already exists
-        existing = await db.execute(select(IdTag).where(IdTag.tag == tag))
-        if existing.scalar_one_or_none():
-            raise HTTPException(status_code=400, detail="ID tag already exists")
-
-        new_tag = IdTag(
-            tag=tag, user_name=user_name, user_email=user_email, status="Accepted"
-        )
-
-        db.add(new_tag)
-        await db.commit()
-        await db.refresh(new_tag)
-
-        return {
-            "id": new_tag.id,
-            "tag": new_tag.tag,
-            "user_name": new_tag.user_name,
-            "user_email": new_tag.user_email,
-            "status": new_tag.status,
-        }
-    except HTTPException:
-        raise
-    except Exception as e:
-        await db.rollback()
-        raise HTTPException(
-            status_code=500, detail=f"Failed to create ID tag: {str(e)}"
-        )
-
+    # Check if tag already exists
+    existing = await db.execute(_ID_TAG_EXISTS_STMT, {"tag": tag})
+    if existing.scalar_one_or_none():
+        raise HTTPException(status_code=400, detail="ID tag already exists")
+
+    new_tag = IdTag(
+        tag=tag, user_name=user_name, user_email=user_email, status="Accepted"
+    )
+
+    db.add(new_tag)
+    await db.commit()
+    await db.refresh(new_tag)
+
+    # The tag may have been cached as unknown by an earlier validation
+    invalidate_id_tag(tag)
+
+    return {
+        "id": new_tag.id,
+        "tag": new_tag.tag,
+        "user_name": new_tag.user_name,
+        "user_email": new_tag.user_email,
+        "status": new_tag.status,
+    }
@@ -5,19 +5,61 @@ This serves HTTP API endpoints alongside the OCPP WebSocket server.
 
 import asyncio
 import threading
-from fastapi import FastAPI
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import ORJSONResponse
 from loguru import logger
 
 from app.api.routes import router
+from app.database import close_db
 from app.main import main as start_ocpp_server
 
 
+def _log_ocpp_server_exit(task: asyncio.Task):
+    """Report the OCPP server stopping with an error."""
+    if not task.cancelled() and task.exception() is not None:
+        logger.error("OCPP server error: {}", task.exception())
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Run the OCPP WebSocket server alongside the API for the app's lifetime."""
+    logger.info("Starting Voltaro API server...")
+
+    # Start OCPP WebSocket server in background
+    logger.info("Starting OCPP WebSocket server in background...")
+    ocpp_server_task = asyncio.create_task(start_ocpp_server(), name="ocpp-server")
+    ocpp_server_task.add_done_callback(_log_ocpp_server_exit)
+
+    logger.info("API server startup complete")
+    yield
+
+    logger.info("Shutting down Voltaro API server...")
+
+    # Cancel OCPP server task
+    ocpp_server_task.cancel()
+    try:
+        await asyncio.wait_for(ocpp_server_task, timeout=5)
+    except asyncio.CancelledError:
+        logger.info("OCPP server task cancelled")
+    except asyncio.TimeoutError:
+        logger.warning("OCPP server task did not stop within 5 seconds")
+    except Exception:
+        # Already reported by _log_ocpp_server_exit
+        pass
+
+    await close_db()
+    logger.info("API server shutdown complete")
+
+
 # Create FastAPI app
 app = FastAPI(
     title="Voltaro API",
     description="REST API for EV charging management",
     version="1.0.0",
+    default_response_class=ORJSONResponse,
+    lifespan=lifespan,
 )
 
 # Add CORS middleware for frontend integration
@@ -30,12 +72,23 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    # Keyset pagination cursor of the list endpoints
+    expose_headers=["X-Next-Before", "X-Next-Before-Id"],
 )
 
 # Include API routes
 app.include_router(router)
 
 
+@app.exception_handler(Exception)
+async def unhandled_exception_handler(request: Request, exc: Exception):
+    """Log unexpected errors once with their traceback and return a generic 500."""
+    logger.opt(exception=exc).error(
+        "Unhandled error on {} {}", request.method, request.url.path
+    )
+    return ORJSONResponse(status_code=500, content={"detail": "Internal server error"})
+
+
 @app.get("/")
 async def root():
     """Health check endpoint."""
@@ -48,49 +101,6 @@ async def health_check():
     return {"status": "healthy", "timestamp": "2024-01-01T00:00:00Z"}
 
 
-# Background task to run OCPP WebSocket server
-ocpp_server_task = None
-
-
-async def start_background_ocpp_server():
-    """Start the OCPP WebSocket server in the background."""
-    global ocpp_server_task
-    try:
-        logger.info("Starting OCPP WebSocket server in background...")
-        ocpp_server_task = asyncio.create_task(start_ocpp_server())
-        await ocpp_server_task
-    except Exception as e:
-        logger.error(f"OCPP server error: {e}")
-
-
-@app.on_event("startup")
-async def startup_event():
-    """Initialize services on startup."""
-    logger.info("Starting Voltaro API server...")
-
-    # Start OCPP WebSocket server in background
-    asyncio.create_task(start_background_ocpp_server())
-
-    logger.info("API server startup complete")
-
-
-@app.on_event("shutdown")
-async def shutdown_event():
-    """Cleanup on shutdown."""
-    logger.info("Shutting down Voltaro API server...")
-
-    # Cancel OCPP server task
-    global ocpp_server_task
-    if ocpp_server_task and not ocpp_server_task.done():
-        ocpp_server_task.cancel()
-        try:
-            await ocpp_server_task
-        except asyncio.CancelledError:
-            logger.info("OCPP server task cancelled")
-
-    logger.info("API server shutdown complete")
-
-
 if __name__ == "__main__":
     import uvicorn
 
@@ -98,4 +108,3 @@ if __name__ == "__main__":
     uvicorn.run(
         "app.api_server:app", host="0.0.0.0", port=8000, reload=True, log_level="info"
     )
-
@@ -0,0 +1,88 @@
+"""
+In-process caching helpers for frequently read, rarely changing data.
+"""
+
+import asyncio
+import time
+from collections import OrderedDict
+
+_MISSING = object()
+
+
+class TTLCache:
+    """
+    Bounded in-memory cache whose entries expire after a fixed time-to-live.
+
+    Once maxsize is reached, the least recently written entry is evicted.
+    Expired entries are dropped lazily when they are read.
+    """
+
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._pending = {}
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key, default=None):
+        """Return the cached value for key, or default if missing or expired."""
+        entry = self._entries.get(key)
+        if entry is None:
+            return default
+
+        expires_at, value = entry
+        if expires_at <= time.monotonic():
+            del self._entries[key]
+            return default
+        return value
+
+    def set(self, key, value):
+        """Store value under key for the cache TTL."""
+        self._entries[key] = (time.monotonic() + self.ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def pop(self, key, default=None):
+        """Remove key from the cache and return its value if present."""
+        entry = self._entries.pop(key, None)
+        return default if entry is None else entry[1]
+
+    def clear(self):
+        """Remove all entries."""
+        self._entries.clear()
+
+    async def get_or_compute(self, key, compute):
+        """
+        Return the cached value for key, computing it on a miss.
+
+        Concurrent misses for the same key share a single in-flight
+        computation instead of each hitting the backing store.
+
+        Args:
+            key: Cache key
+            compute: Zero-argument coroutine function producing the value
+
+        Returns:
+            The cached or freshly computed value
+        """
+        value = self.get(key, _MISSING)
+        if value is not _MISSING:
+            return value
+
+        pending = self._pending.get(key)
+        if pending is None:
+            pending = asyncio.ensure_future(compute())
+            self._pending[key] = pending
+            pending.add_done_callback(lambda task: self._store_result(key, task))
+
+        # Shield so one cancelled caller does not cancel the shared computation
+        return await asyncio.shield(pending)
+
+    def _store_result(self, key, task):
+        """Cache the result of a finished computation started by get_or_compute."""
+        self._pending.pop(key, None)
+        if not task.cancelled() and task.exception() is None:
+            self.set(key, task.result())
@@ -5,16 +5,101 @@ Central System operations for sending commands to charge points.
 import asyncio
 from datetime import datetime, timezone
 from loguru import logger
-from ocpp.v16 import call
+from ocpp.v16.call import (
+    ChangeAvailability,
+    RemoteStartTransaction,
+    RemoteStopTransaction,
+)
 from app.connection_manager import (
     get_connected_charge_point,
     get_all_connected_charge_points,
     get_database_connection_status,
 )
-from app.database import AsyncSessionLocal
-from app.models import ChargePoint as ChargePointModel, IdTag, Session
-from app.utils import utc_now_iso, utc_now_naive
-from sqlalchemy import select
+from app.cache import TTLCache
+from app.config import CONNECTION_STATUS_TTL
+from app.database import release_connection, session_scope
+from app.id_tags import get_id_tag, get_id_tags, is_expired
+from app.models import ChargePoint as ChargePointModel, Session
+from app.utils import utc_now_iso
+from sqlalchemy import bindparam, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+
+_UNCACHED = object()
+
+# Charge point status (all, and per charge point) is polled by the CLI and
+# dashboards; a short TTL collapses repeated and concurrent polls into one
+# query
+_connection_status_cache = TTLCache(maxsize=1, ttl=CONNECTION_STATUS_TTL)
+_charge_point_status_cache = TTLCache(maxsize=10000, ttl=CONNECTION_STATUS_TTL)
+
+# Charge point columns read by status/availability checks; a Core row avoids
+# building a full ORM entity for these read-only lookups
+_CHARGE_POINT_STATUS_STMT = select(
+    ChargePointModel.id,
+    ChargePointModel.is_online,
+    ChargePointModel.status,
+    ChargePointModel.last_seen,
+    ChargePointModel.vendor,
+    ChargePointModel.model,
+).where(ChargePointModel.id == bindparam("charge_point_id"))
+
+# Transaction lookup used to validate RemoteStopTransaction requests; joins
+# the charge point so its database online flag comes back in the same query
+_ACTIVE_SESSION_CHECK_STMT = (
+    select(Session.connector_id, ChargePointModel.is_online)
+    .join(ChargePointModel, ChargePointModel.id == Session.charge_point_id)
+    .where(Session.transaction_id == bindparam("transaction_id"))
+    .where(Session.charge_point_id == bindparam("charge_point_id"))
+    .where(Session.status == "Active")
+)
+# Only run when the check above finds nothing, to report why
+_SESSION_STATUS_STMT = (
+    select(Session.status)
+    .where(Session.transaction_id == bindparam("transaction_id"))
+    .where(Session.charge_point_id == bindparam("charge_point_id"))
+)
+
+
+def _id_tag_validation_result(id_tag: str, tag_record):
+    """Build the validate_id_tag result from a validation row (None if unknown)."""
+    if not tag_record:
+        return {
+            "id_tag": id_tag,
+            "valid": False,
+            "status": "Invalid",
+            "reason": "ID tag not found",
+        }
+
+    # Check if tag is blocked (status field instead of is_blocked)
+    if tag_record.status == "Blocked":
+        return {
+            "id_tag": id_tag,
+            "valid": False,
+            "status": "Blocked",
+            "reason": "ID tag is blocked",
+        }
+
+    # Check expiry date
+    if is_expired(tag_record):
+        return {
+            "id_tag": id_tag,
+            "valid": False,
+            "status": "Expired",
+            "reason": "ID tag has expired",
+            "expiry_date": tag_record.expiry_date.isoformat(),
+        }
+
+    # Tag is valid
+    return {
+        "id_tag": id_tag,
+        "valid": True,
+        "status": "Accepted",
+        "expiry_date": (
+            tag_record.expiry_date.isoformat() if tag_record.expiry_date else None
+        ),
+        "parent_id_tag": tag_record.parent_id_tag,
+    }
 
 
 class CentralSystem:
@@ -26,6 +111,7 @@ class CentralSystem:
         id_tag: str,
         connector_id: int = None,
         charging_profile: dict = None,
+        session: AsyncSession = None,
     ):
         """
         Send RemoteStartTransaction request to a charge point.
@@ -35,25 +121,32 @@ class CentralSystem:
             id_tag: ID tag to authorize the transaction
             connector_id: Optional specific connector ID
             charging_profile: Optional charging profile configuration
+            session: Optional database session to reuse
 
         Returns:
             dict: Response from charge point with status
         """
         logger.info(
-            f"Central System initiating RemoteStartTransaction to {charge_point_id}: "
-            f"idTag={id_tag}, connectorId={connector_id}"
+            "Central System initiating RemoteStartTransaction to {}: idTag={}, connectorId={}",
+            charge_point_id,
+            id_tag,
+            connector_id,
         )
 
         # Get the connected charge point (in-memory WebSocket connection)
         charge_point = get_connected_charge_point(charge_point_id)
         if not charge_point:
             # Check if it exists in database but not connected to this process
-            async with AsyncSessionLocal() as session:
+            async with session_scope(session) as session:
                 try:
-                    cp_record = await session.get(ChargePointModel, charge_point_id)
+                    cp_result = await session.execute(
+                        _CHARGE_POINT_STATUS_STMT, {"charge_point_id": charge_point_id}
+                    )
+                    cp_record = cp_result.one_or_none()
                     if cp_record and cp_record.is_online:
                         logger.error(
-                            f"Charge point {charge_point_id} is online in database but not connected to this Central System process"
+                            "Charge point {} is online in database but not connected to this Central System process",
+                            charge_point_id,
                         )
                         return {
                             "success": False,
@@ -61,14 +154,16 @@ class CentralSystem:
                             "status": "Rejected",
                         }
                     else:
-                        logger.error(f"Charge point {charge_point_id} is not connected")
+                        logger.error(
+                            "Charge point {} is not connected", charge_point_id
+                        )
                         return {
                             "success": False,
                             "error": "Charge point not connected",
                             "status": "Rejected",
                         }
                 except Exception as e:
-                    logger.error(f"Failed to check charge point status: {e}")
+                    logger.error("Failed to check charge point status: {}", e)
                     return {
                         "success": False,
                         "error": f"Failed to check charge point status: {e}",
@@ -77,10 +172,14 @@ class CentralSystem:
 
         try:
             # Validate ID tag first
-            id_tag_validation = await CentralSystem.validate_id_tag(id_tag)
+            id_tag_validation = await CentralSystem.validate_id_tag(
+                id_tag, session=session
+            )
             if not id_tag_validation["valid"]:
                 logger.info(
-                    f"RemoteStartTransaction rejected: ID tag {id_tag} is {id_tag_validation['status']}"
+                    "RemoteStartTransaction rejected: ID tag {} is {}",
+                    id_tag,
+                    id_tag_validation["status"],
                 )
                 return {
                     "success": False,
@@ -98,12 +197,16 @@ class CentralSystem:
             if charging_profile is not None:
                 request_params["charging_profile"] = charging_profile
 
-            # Create and send the RemoteStartTransaction request
-            request = call.RemoteStartTransaction(**request_params)
+            # Create and send the RemoteStartTransaction request, without
+            # holding a connection across the round-trip
+            request = RemoteStartTransaction(**request_params)
+            await release_connection(session)
             response = await charge_point.call(request)
 
             logger.info(
-                f"RemoteStartTransaction response from {charge_point_id}: {response.status}"
+                "RemoteStartTransaction response from {}: {}",
+                charge_point_id,
+                response.status,
             )
 
             return {
@@ -117,64 +220,82 @@ class CentralSystem:
 
         except Exception as e:
             logger.error(
-                f"Failed to send RemoteStartTransaction to {charge_point_id}: {e}"
+                "Failed to send RemoteStartTransaction to {}: {}", charge_point_id, e
             )
             return {"success": False, "error": str(e), "status": "Rejected"}
 
     @staticmethod
-    async def remote_stop_transaction(charge_point_id: str, transaction_id: int):
+    async def remote_stop_transaction(
+        charge_point_id: str, transaction_id: int, session: AsyncSession = None
+    ):
         """
         Send RemoteStopTransaction request to a charge point.
 
         Args:
             charge_point_id: ID of the target charge point
             transaction_id: ID of the transaction to stop
+            session: Optional database session to reuse
 
         Returns:
             dict: Response from charge point with status
         """
         logger.info(
-            f"Central System initiating RemoteStopTransaction to {charge_point_id}: "
-            f"transactionId={transaction_id}"
+            "Central System initiating RemoteStopTransaction to {}: transactionId={}",
+            charge_point_id,
+            transaction_id,
         )
 
         # Validate transaction exists and is active before sending request
-        async with AsyncSessionLocal() as session:
+        async with session_scope(session) as session:
             try:
-                # Check if transaction exists and belongs to the specified charge point
+                # Check the transaction is active and belongs to the specified
+                # charge point in a single index probe
+                params = {
+                    "transaction_id": transaction_id,
+                    "charge_point_id": charge_point_id,
+                }
                 session_result = await session.execute(
-                    select(Session)
-                    .where(Session.transaction_id == transaction_id)
-                    .where(Session.charge_point_id == charge_point_id)
+                    _ACTIVE_SESSION_CHECK_STMT, params
                 )
-                session_record = session_result.scalar_one_or_none()
+                session_record = session_result.one_or_none()
 
                 if not session_record:
-                    logger.error(
-                        f"Transaction {transaction_id} not found for charge point {charge_point_id}"
-                    )
-                    return {
-                        "success": False,
-                        "error": f"Transaction {transaction_id} not found for charge point {charge_point_id}",
-                        "status": "Rejected",
-                    }
+                    # Rejected either way; only now look up whether the
+                    # transaction is missing or just no longer active
+                    status_result = await session.execute(_SESSION_STATUS_STMT, params)
+                    session_status = status_result.scalar_one_or_none()
+
+                    if session_status is None:
+                        logger.error(
+                            "Transaction {} not found for charge point {}",
+                            transaction_id,
+                            charge_point_id,
+                        )
+                        return {
+                            "success": False,
+                            "error": f"Transaction {transaction_id} not found for charge point {charge_point_id}",
+                            "status": "Rejected",
+                        }
 
-                if session_record.status != "Active":
                     logger.error(
-                        f"Transaction {transaction_id} is not active (status: {session_record.status})"
+                        "Transaction {} is not active (status: {})",
+                        transaction_id,
+                        session_status,
                     )
                     return {
                         "success": False,
-                        "error": f"Transaction {transaction_id} is not active (status: {session_record.status})",
+                        "error": f"Transaction {transaction_id} is not active (status: {session_status})",
                         "status": "Rejected",
                     }
 
                 logger.info(
-                    f"Transaction {transaction_id} validated: Active on connector {session_record.connector_id}"
+                    "Transaction {} validated: Active on connector {}",
+                    transaction_id,
+                    session_record.connector_id,
                 )
 
             except Exception as e:
-                logger.error(f"Failed to validate transaction {transaction_id}: {e}")
+                logger.error("Failed to validate transaction {}: {}", transaction_id, e)
                 return {
                     "success": False,
                     "error": f"Failed to validate transaction: {e}",
@@ -184,7 +305,17 @@ class CentralSystem:
         # Get the connected charge point
         charge_point = get_connected_charge_point(charge_point_id)
         if not charge_point:
-            logger.error(f"Charge point {charge_point_id} is not connected")
+            if session_record.is_online:
+                logger.error(
+                    "Charge point {} is online in database but not connected to this Central System process",
+                    charge_point_id,
+                )
+                return {
+                    "success": False,
+                    "error": "Charge point is online but not connected to this Central System process. Central System operations must run in the same process as the OCPP server.",
+                    "status": "Rejected",
+                }
+            logger.error("Charge point {} is not connected", charge_point_id)
             return {
                 "success": False,
                 "error": "Charge point not connected",
@@ -192,12 +323,16 @@ class CentralSystem:
             }
 
         try:
-            # Create and send the RemoteStopTransaction request
-            request = call.RemoteStopTransaction(transaction_id=transaction_id)
+            # Create and send the RemoteStopTransaction request, without
+            # holding a connection across the round-trip
+            request = RemoteStopTransaction(transaction_id=transaction_id)
+            await release_connection(session)
             response = await charge_point.call(request)
 
             logger.info(
-                f"RemoteStopTransaction response from {charge_point_id}: {response.status}"
+                "RemoteStopTransaction response from {}: {}",
+                charge_point_id,
+                response.status,
             )
 
             return {
@@ -210,65 +345,77 @@ class CentralSystem:
 
         except Exception as e:
             logger.error(
-                f"Failed to send RemoteStopTransaction to {charge_point_id}: {e}"
+                "Failed to send RemoteStopTransaction to {}: {}", charge_point_id, e
             )
             return {"success": False, "error": str(e), "status": "Rejected"}
 
     @staticmethod
-    async def get_charge_point_status(charge_point_id: str = None):
+    async def get_charge_point_status(
+        charge_point_id: str = None, session: AsyncSession = None
+    ):
         """
         Get status of charge points.
 
         Args:
             charge_point_id: Optional specific charge point ID
+            session: Optional database session to reuse
 
         Returns:
             dict: Status information
         """
         if charge_point_id:
-            # Get specific charge point status from database
-            async with AsyncSessionLocal() as session:
-                try:
-                    cp_record = await session.get(ChargePointModel, charge_point_id)
-                    if cp_record:
-                        # Check if it's actually connected in this process (for Central System operations)
-                        in_memory_connected = (
-                            get_connected_charge_point(charge_point_id) is not None
+            # Get specific charge point status from database; polled per charge
+            # point, so the row is reused for the same short TTL as the overview
+            cp_record = _charge_point_status_cache.get(charge_point_id, _UNCACHED)
+            if cp_record is _UNCACHED:
+                async with session_scope(session) as session:
+                    try:
+                        cp_result = await session.execute(
+                            _CHARGE_POINT_STATUS_STMT,
+                            {"charge_point_id": charge_point_id},
                         )
-
-                        return {
-                            "charge_point_id": charge_point_id,
-                            "connected": cp_record.is_online,  # Use database status for cross-process
-                            "in_memory_connected": in_memory_connected,  # For debugging
-                            "online": cp_record.is_online,
-                            "status": cp_record.status,
-                            "last_seen": (
-                                cp_record.last_seen.isoformat()
-                                if cp_record.last_seen
-                                else None
-                            ),
-                            "vendor": cp_record.vendor,
-                            "model": cp_record.model,
-                        }
-                    else:
+                        cp_record = cp_result.one_or_none()
+                    except Exception as e:
+                        logger.error("Failed to get charge point status: {}", e)
                         return {
                             "charge_point_id": charge_point_id,
                             "connected": False,
-                            "error": "Charge point not found in database",
+                            "error": str(e),
                         }
-                except Exception as e:
-                    logger.error(f"Failed to get charge point status: {e}")
-                    return {
-                        "charge_point_id": charge_point_id,
-                        "connected": False,
-                        "error": str(e),
-                    }
+                _charge_point_status_cache.set(charge_point_id, cp_record)
+
+            if cp_record:
+                # Check if it's actually connected in this process (for Central System operations)
+                in_memory_connected = (
+                    get_connected_charge_point(charge_point_id) is not None
+                )
+
+                return {
+                    "charge_point_id": charge_point_id,
+                    "connected": cp_record.is_online,  # Use database status for cross-process
+                    "in_memory_connected": in_memory_connected,  # For debugging
+                    "online": cp_record.is_online,
+                    "status": cp_record.status,
+                    "last_seen": (
+                        cp_record.last_seen.isoformat() if cp_record.last_seen else None
+                    ),
+                    "vendor": cp_record.vendor,
+                    "model": cp_record.model,
+                }
+            else:
+                return {
+                    "charge_point_id": charge_point_id,
+                    "connected": False,
+                    "error": "Charge point not found in database",
+                }
         else:
             # Get all charge points status from database (works across processes)
             try:
-                return await get_database_connection_status()
+                return await _connection_status_cache.get_or_compute(
+                    "all", get_database_connection_status
+                )
             except Exception as e:
-                logger.error(f"Failed to get all charge points status: {e}")
+                logger.error("Failed to get all charge points status: {}", e)
                 return {
                     "error": str(e),
                     "total_charge_points": 0,
@@ -277,72 +424,65 @@ class CentralSystem:
                 }
 
     @staticmethod
-    async def validate_id_tag(id_tag: str):
+    async def validate_id_tag(id_tag: str, session: AsyncSession = None):
         """
         Validate an ID tag against the database.
 
+        Lookups are cached briefly per tag (including unknown tags); call
+        invalidate_id_tag() after changing a tag so it is re-read.
+
         Args:
             id_tag: ID tag to validate
+            session: Optional database session to reuse
 
         Returns:
             dict: Validation result
         """
-        async with AsyncSessionLocal() as session:
-            try:
-                # Check if ID tag exists and is valid
-                tag_result = await session.execute(
-                    select(IdTag).where(IdTag.tag == id_tag)
-                )
-                tag_record = tag_result.scalar_one_or_none()
+        try:
+            # Check if ID tag exists and is valid
+            tag_record = await get_id_tag(id_tag, session=session)
+        except Exception as e:
+            logger.error("Failed to validate ID tag {}: {}", id_tag, e)
+            return {
+                "id_tag": id_tag,
+                "valid": False,
+                "status": "Invalid",
+                "error": str(e),
+            }
 
-                if not tag_record:
-                    return {
-                        "id_tag": id_tag,
-                        "valid": False,
-                        "status": "Invalid",
-                        "reason": "ID tag not found",
-                    }
+        return _id_tag_validation_result(id_tag, tag_record)
 
-                # Check if tag is blocked (status field instead of is_blocked)
-                if tag_record.status == "Blocked":
-                    return {
-                        "id_tag": id_tag,
-                        "valid": False,
-                        "status": "Blocked",
-                        "reason": "ID tag is blocked",
-                    }
-
-                # Check expiry date
-                if tag_record.expiry_date and tag_record.expiry_date < utc_now_naive():
-                    return {
-                        "id_tag": id_tag,
-                        "valid": False,
-                        "status": "Expired",
-                        "reason": "ID tag has expired",
-                        "expiry_date": tag_record.expiry_date.isoformat(),
-                    }
+    @staticmethod
+    async def validate_id_tags_bulk(id_tags: list, session: AsyncSession = None):
+        """
+        Validate several ID tags, fetching all uncached tags in one query.
 
-                # Tag is valid
-                return {
-                    "id_tag": id_tag,
-                    "valid": True,
-                    "status": "Accepted",
-                    "expiry_date": (
-                        tag_record.expiry_date.isoformat()
-                        if tag_record.expiry_date
-                        else None
-                    ),
-                    "parent_id_tag": tag_record.parent_id_tag,
-                }
+        Args:
+            id_tags: ID tags to validate
+            session: Optional database session to reuse
 
-            except Exception as e:
-                logger.error(f"Failed to validate ID tag {id_tag}: {e}")
-                return {
+        Returns:
+            dict: Validation result per ID tag, as returned by validate_id_tag
+        """
+        try:
+            tag_records = await get_id_tags(id_tags, session=session)
+        except Exception as e:
+            logger.error("Failed to validate ID tags {}: {}", id_tags, e)
+            return {
+                id_tag: {
                     "id_tag": id_tag,
                     "valid": False,
                     "status": "Invalid",
                     "error": str(e),
                 }
+                for id_tag in id_tags
+            }
+
+        # Keep the caller's order
+        return {
+            id_tag: _id_tag_validation_result(id_tag, tag_records[id_tag])
+            for id_tag in dict.fromkeys(id_tags)
+        }
 
     async def change_availability(
         self, charge_point_id: str, connector_id: int, availability_type: str
@@ -365,13 +505,15 @@ class CentralSystem:
             dict: Response with status and details
         """
         logger.info(
-            f"Sending ChangeAvailability to {charge_point_id}: "
-            f"connectorId={connector_id}, type={availability_type}"
+            "Sending ChangeAvailability to {}: connectorId={}, type={}",
+            charge_point_id,
+            connector_id,
+            availability_type,
         )
 
         # Validate inputs
         if availability_type not in ["Operative", "Inoperative"]:
-            logger.error(f"Invalid availability type: {availability_type}")
+            logger.error("Invalid availability type: {}", availability_type)
             return {
                 "status": "Rejected",
                 "error": f"Invalid availability type: {availability_type}",
@@ -379,75 +521,83 @@ class CentralSystem:
 
         # MVP: Validate connector_id (0 = charge point, 1 = single connector)
         if connector_id < 0 or connector_id > 1:
-            logger.error(f"Invalid connector_id: {connector_id} (MVP supports 0 or 1)")
+            logger.error("Invalid connector_id: {} (MVP supports 0 or 1)", connector_id)
             return {
                 "status": "Rejected",
                 "error": f"Invalid connector_id: {connector_id} (MVP supports 0 or 1)",
             }
 
-        async with AsyncSessionLocal() as session:
-            try:
-                # Validate charge point exists and is online
-                charge_point = await session.get(ChargePointModel, charge_point_id)
-                if not charge_point:
-                    logger.warning(f"Charge point not found: {charge_point_id}")
-                    return {
-                        "status": "Rejected",
-                        "error": f"Charge point not found: {charge_point_id}",
-                    }
+        # Sending needs this process's WebSocket connection; checking it first
+        # rejects unreachable charge points without touching the database
+        charge_point_connection = get_connected_charge_point(charge_point_id)
+        if not charge_point_connection:
+            logger.warning("No active connection for: {}", charge_point_id)
+            return {
+                "status": "Rejected",
+                "error": f"No active connection for: {charge_point_id}",
+            }
 
-                if not charge_point.is_online:
-                    logger.warning(f"Charge point offline: {charge_point_id}")
-                    return {
-                        "status": "Rejected",
-                        "error": f"Charge point offline: {charge_point_id}",
-                    }
+        # Validate charge point exists and is online; the connection is
+        # released before the request goes out rather than held across the
+        # round-trip (a shared session outlives this block, so release it)
+        async with session_scope() as session:
+            try:
+                cp_result = await session.execute(
+                    _CHARGE_POINT_STATUS_STMT, {"charge_point_id": charge_point_id}
+                )
+                charge_point = cp_result.one_or_none()
+            except Exception as e:
+                logger.error("Failed to process ChangeAvailability request: {}", e)
+                return {
+                    "status": "Rejected",
+                    "error": f"Database error: {str(e)}",
+                }
 
-                # Get charge point connection
-                charge_point_connection = get_connected_charge_point(charge_point_id)
-                if not charge_point_connection:
-                    logger.warning(f"No active connection for: {charge_point_id}")
-                    return {
-                        "status": "Rejected",
-                        "error": f"No active connection for: {charge_point_id}",
-                    }
+        if not charge_point:
+            logger.warning("Charge point not found: {}", charge_point_id)
+            return {
+                "status": "Rejected",
+                "error": f"Charge point not found: {charge_point_id}",
+            }
 
-                # Send ChangeAvailability request
-                request = call.ChangeAvailability(
-                    connector_id=connector_id, type=availability_type
-                )
+        if not charge_point.is_online:
+            logger.warning("Charge point offline: {}", charge_point_id)
+            return {
+                "status": "Rejected",
+                "error": f"Charge point offline: {charge_point_id}",
+            }
 
-                try:
-                    response = await charge_point_connection.call(request)
+        # Send ChangeAvailability request
+        request = ChangeAvailability(connector_id=connector_id, type=availability_type)
+        await release_connection()
 
-                    logger.info(
-                        f"ChangeAvailability response from {charge_point_id}: {response.status}"
-                    )
+        try:
+            response = await charge_point_connection.call(request)
 
-                    return {
-                        "status": response.status,
-                        "charge_point_id": charge_point_id,
-                        "connector_id": connector_id,
-                        "availability_type": availability_type,
-                        "timestamp": utc_now_iso(),
-                    }
+            logger.info(
+                "ChangeAvailability response from {}: {}",
+                charge_point_id,
+                response.status,
+            )
 
-                except Exception as call_error:
-                    logger.error(
-                        f"Failed to send ChangeAvailability to {charge_point_id}: {call_error}"
-                    )
-                    return {
-                        "status": "Rejected",
-                        "error": f"Communication error: {str(call_error)}",
-                    }
+            return {
+                "status": response.status,
+                "charge_point_id": charge_point_id,
+                "connector_id": connector_id,
+                "availability_type": availability_type,
+                "timestamp": utc_now_iso(),
+            }
 
-            except Exception as e:
-                logger.error(f"Failed to process ChangeAvailability request: {e}")
-                await session.rollback()
-                return {
-                    "status": "Rejected",
-                    "error": f"Database error: {str(e)}",
-                }
+        except Exception as call_error:
+            logger.error(
+                "Failed to send ChangeAvailability to {}: {}",
+                charge_point_id,
+                call_error,
+            )
+            return {
+                "status": "Rejected",
+                "error": f"Communication error: {str(call_error)}",
+            }
 
 
 # Convenience functions for easy access
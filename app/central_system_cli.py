@@ -8,10 +8,14 @@ import sys
 from datetime import datetime
 from loguru import logger
 from app.connection_manager import (
+    add_connection_listener,
     get_all_connected_charge_points,
     get_connected_charge_point,
+    get_connected_charge_point_ids,
+    remove_connection_listener,
 )
 from app.central_system import CentralSystem
+from app.database import shared_session
 
 
 class CentralSystemCLI:
@@ -20,10 +24,19 @@ class CentralSystemCLI:
     def __init__(self):
         self.running = False
         self.central_system = CentralSystem()  # Instance for non-static methods
+        self._stdin_reader = None
+        self._stdin_attached = False
+        self._connected_count = 0
+
+    def _on_connection_change(self, charge_point_id, connected):
+        """Keep the prompt's connected count current as charge points come and go."""
+        self._connected_count = len(get_all_connected_charge_points())
 
     async def start(self):
         """Start the CLI interface."""
         self.running = True
+        self._connected_count = len(get_all_connected_charge_points())
+        add_connection_listener(self._on_connection_change)
         print("\n" + "=" * 60)
         print("🎯 OCPP Central System Command Interface")
         print("=" * 60)
@@ -35,7 +48,7 @@ class CentralSystemCLI:
             "  start <cp_id> <id_tag> <connector> - Remote start on specific connector"
         )
         print("  stop <cp_id> <tx_id>      - Remote stop transaction")
-        print("  validate <id_tag>         - Validate ID tag")
+        print("  validate <id_tag> [...]   - Validate one or more ID tags")
         print("  list_charge_points        - Show all registered charge points")
         print(
             "  remote_start <cp_id> <id_tag> [connector_id] - Start remote transaction"
@@ -56,30 +69,66 @@ class CentralSystemCLI:
         print()
         print("=" * 60)
 
-        while self.running:
-            try:
-                # Show prompt with connected charge points count
-                connected = get_all_connected_charge_points()
-                prompt = f"Central System ({len(connected)} CPs connected) > "
-
-                # Get user input
-                command = await self._get_input(prompt)
-                if command:
-                    await self._process_command(command.strip())
+        try:
+            while self.running:
+                try:
+                    # Show prompt with connected charge points count
+                    prompt = (
+                        f"Central System ({self._connected_count} CPs connected) > "
+                    )
 
-            except KeyboardInterrupt:
-                print("\n👋 Exiting Central System CLI...")
-                break
-            except Exception as e:
-                print(f"❌ Error: {e}")
+                    # Get user input
+                    command = await self._get_input(prompt)
+                    if command:
+                        # Every database step of one command shares a session
+                        async with shared_session():
+                            await self._process_command(command.strip())
+
+                except KeyboardInterrupt:
+                    print("\n👋 Exiting Central System CLI...")
+                    break
+                except Exception as e:
+                    print(f"❌ Error: {e}")
+        finally:
+            remove_connection_listener(self._on_connection_change)
 
     async def _get_input(self, prompt):
         """Get user input asynchronously."""
         print(prompt, end="", flush=True)
 
-        # Use asyncio to read from stdin without blocking
-        loop = asyncio.get_event_loop()
-        return await loop.run_in_executor(None, sys.stdin.readline)
+        reader = await self._get_stdin_reader()
+        if reader is None:
+            # stdin is a terminal or can't be watched by the event loop
+            # (e.g. a regular file or Windows console), so use a worker thread
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(None, sys.stdin.readline)
+
+        line = await reader.readline()
+        return line.decode(errors="replace")
+
+    async def _get_stdin_reader(self):
+        """
+        Attach an asyncio stream reader to stdin on first use.
+
+        Reading through the event loop avoids parking a thread-pool worker
+        on sys.stdin.readline for as long as the prompt is open. Terminals
+        are left alone: connect_read_pipe makes stdin non-blocking, and a tty
+        shares that flag with stdout/stderr, so prints could fail mid-write.
+        """
+        if not self._stdin_attached:
+            self._stdin_attached = True
+            if sys.stdin.isatty():
+                return None
+            loop = asyncio.get_running_loop()
+            reader = asyncio.StreamReader()
+            try:
+                await loop.connect_read_pipe(
+                    lambda: asyncio.StreamReaderProtocol(reader), sys.stdin
+                )
+                self._stdin_reader = reader
+            except (NotImplementedError, OSError, ValueError):
+                pass
+        return self._stdin_reader
 
     async def _process_command(self, command):
         """Process a CLI command."""
@@ -174,9 +223,9 @@ class CentralSystemCLI:
         print("\n🔌 Connected Charge Points:")
         print("-" * 35)
 
-        connected = get_all_connected_charge_points()
-        if connected:
-            for cp_id, cp_instance in connected.items():
+        connected_ids = get_connected_charge_point_ids()
+        if connected_ids:
+            for cp_id in connected_ids:
                 print(f"  🟢 {cp_id} - Ready for Central System operations")
         else:
             print("  No charge points currently connected")
@@ -255,21 +304,24 @@ class CentralSystemCLI:
     async def _validate_tag(self, args):
         """Handle validate tag command."""
         if len(args) < 1:
-            print("❌ Usage: validate <id_tag>")
+            print("❌ Usage: validate <id_tag> [<id_tag> ...]")
             return
 
-        id_tag = args[0]
-
-        print(f"\n🏷️  Validating ID Tag: {id_tag}")
+        print(f"\n🏷️  Validating ID Tag: {', '.join(args)}")
 
         try:
-            result = await CentralSystem.validate_id_tag(id_tag)
-
-            status_icon = "✅" if result["status"] == "Accepted" else "❌"
-            print(f"   {status_icon} ID Tag: {id_tag}")
-            print(f"   Status: {result['status']}")
-            if result.get("reason"):
-                print(f"   Reason: {result['reason']}")
+            if len(args) == 1:
+                results = {args[0]: await CentralSystem.validate_id_tag(args[0])}
+            else:
+                # One query for all tags instead of one per tag
+                results = await CentralSystem.validate_id_tags_bulk(args)
+
+            for id_tag, result in results.items():
+                status_icon = "✅" if result["status"] == "Accepted" else "❌"
+                print(f"   {status_icon} ID Tag: {id_tag}")
+                print(f"   Status: {result['status']}")
+                if result.get("reason"):
+                    print(f"   Reason: {result['reason']}")
 
         except Exception as e:
             print(f"   ❌ Error: {e}")
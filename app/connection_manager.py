@@ -5,83 +5,134 @@ This module avoids circular imports between main.py and central_system.py.
 
 import asyncio
 from datetime import datetime, timezone
+from types import MappingProxyType
 from loguru import logger
 from app.database import AsyncSessionLocal
 from app.models import ChargePoint as ChargePointModel
-from app.utils import utc_now_naive
-from sqlalchemy import select
+from app.utils import utc_now_sql
+from app.writers import forget_charge_point
+from sqlalchemy import bindparam, select, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 
 # Global dictionary to store connected charge points for Central System operations
-# This is only valid within the server process
+# This is only valid within the server process. Writers (connect/disconnect,
+# which are rare) rebind a fresh copy instead of mutating in place, so readers
+# (frequent) can use the current dict as a stable snapshot without a lock or
+# a copy, and never see it change size mid-iteration.
 _connected_charge_points = {}
 
+# Callbacks run as listener(charge_point_id, connected) on connect/disconnect
+_connection_listeners = []
+
+
+def add_connection_listener(listener):
+    """Notify listener(charge_point_id, connected) on every connect and disconnect."""
+    _connection_listeners.append(listener)
+
+
+def remove_connection_listener(listener):
+    """Stop notifying a listener added with add_connection_listener."""
+    if listener in _connection_listeners:
+        _connection_listeners.remove(listener)
+
+
+def _notify_connection_listeners(charge_point_id: str, connected: bool):
+    """Run connection listeners; a failing one must not break (un)registration."""
+    for listener in list(_connection_listeners):
+        try:
+            listener(charge_point_id, connected)
+        except Exception as e:
+            logger.error("Connection listener failed for {}: {}", charge_point_id, e)
+
+
+# Conditional, so rows that are missing or already offline are left alone
+_MARK_OFFLINE_STMT = (
+    update(ChargePointModel.__table__)
+    .where(
+        ChargePointModel.id == bindparam("charge_point_id"),
+        ChargePointModel.is_online.is_(True),
+    )
+    .values(is_online=False, last_seen=utc_now_sql())
+)
+
 
 async def register_charge_point(charge_point_id: str, charge_point_instance):
     """Register a connected charge point."""
-    _connected_charge_points[charge_point_id] = charge_point_instance
+    global _connected_charge_points
+    _connected_charge_points = {
+        **_connected_charge_points,
+        charge_point_id: charge_point_instance,
+    }
     logger.info(
-        f"Registered charge point {charge_point_id} for Central System operations"
+        "Registered charge point {} for Central System operations", charge_point_id
     )
+    _notify_connection_listeners(charge_point_id, True)
 
     # Update database to reflect connection status
     try:
-        async with AsyncSessionLocal() as session:
-            # Get or create charge point record
-            cp_result = await session.execute(
-                select(ChargePointModel).where(ChargePointModel.id == charge_point_id)
-            )
-            cp_record = cp_result.scalar_one_or_none()
-
-            if cp_record:
-                cp_record.is_online = True
-                cp_record.last_seen = utc_now_naive()
-                cp_record.status = "Available"  # Default status when connecting
-            else:
-                # Create new charge point record if it doesn't exist
-                cp_record = ChargePointModel(
-                    id=charge_point_id,
-                    is_online=True,
-                    last_seen=utc_now_naive(),
-                    status="Available",
-                    vendor="Mock",  # Default for test clients
-                    model="TestCP",
-                )
-                session.add(cp_record)
+        # Mark the charge point online, creating its record if needed, in
+        # a single upsert
+        insert_stmt = pg_insert(ChargePointModel).values(
+            id=charge_point_id,
+            is_online=True,
+            last_seen=utc_now_sql(),
+            status="Available",  # Default status when connecting
+            vendor="Mock",  # Default for test clients
+            model="TestCP",
+        )
+        stmt = insert_stmt.on_conflict_do_update(
+            index_elements=[ChargePointModel.id],
+            set_={
+                "is_online": True,
+                "last_seen": insert_stmt.excluded.last_seen,
+                "status": "Available",
+                # onupdate defaults don't apply to ON CONFLICT, so set it here
+                "updated_at": utc_now_sql(),
+            },
+        )
 
+        async with AsyncSessionLocal() as session:
+            await session.execute(stmt)
             await session.commit()
-            logger.info(f"Updated database: {charge_point_id} is now online")
+            logger.info("Updated database: {} is now online", charge_point_id)
 
     except Exception as e:
         logger.error(
-            f"Failed to update database for charge point {charge_point_id}: {e}"
+            "Failed to update database for charge point {}: {}", charge_point_id, e
         )
 
 
 async def unregister_charge_point(charge_point_id: str):
     """Unregister a charge point when it disconnects."""
-    if charge_point_id in _connected_charge_points:
-        del _connected_charge_points[charge_point_id]
-        logger.info(
-            f"Unregistered charge point {charge_point_id} from Central System operations"
-        )
+    global _connected_charge_points
+    if charge_point_id not in _connected_charge_points:
+        # Never registered or already unregistered: nothing to update
+        return
+
+    remaining = dict(_connected_charge_points)
+    del remaining[charge_point_id]
+    _connected_charge_points = remaining
+    # A heartbeat buffered before the disconnect must not be written after it
+    forget_charge_point(charge_point_id)
+    _notify_connection_listeners(charge_point_id, False)
+    logger.info(
+        "Unregistered charge point {} from Central System operations",
+        charge_point_id,
+    )
 
     # Update database to reflect disconnection
     try:
         async with AsyncSessionLocal() as session:
-            cp_result = await session.execute(
-                select(ChargePointModel).where(ChargePointModel.id == charge_point_id)
+            result = await session.execute(
+                _MARK_OFFLINE_STMT, {"charge_point_id": charge_point_id}
             )
-            cp_record = cp_result.scalar_one_or_none()
-
-            if cp_record:
-                cp_record.is_online = False
-                cp_record.last_seen = utc_now_naive()
-                await session.commit()
-                logger.info(f"Updated database: {charge_point_id} is now offline")
+            await session.commit()
+            if result.rowcount:
+                logger.info("Updated database: {} is now offline", charge_point_id)
 
     except Exception as e:
         logger.error(
-            f"Failed to update database for charge point {charge_point_id}: {e}"
+            "Failed to update database for charge point {}: {}", charge_point_id, e
         )
 
 
@@ -91,13 +142,29 @@ def get_connected_charge_point(charge_point_id: str):
 
 
 def get_all_connected_charge_points():
-    """Get all connected charge points."""
-    return dict(_connected_charge_points)
+    """
+    Get all connected charge points.
+
+    Returns a read-only view of the current registry snapshot. The snapshot
+    is never mutated in place, so the view can be iterated safely without
+    copying it.
+    """
+    return MappingProxyType(_connected_charge_points)
 
 
 def get_connected_charge_point_ids():
-    """Get list of connected charge point IDs."""
-    return list(_connected_charge_points.keys())
+    """Get a tuple of connected charge point IDs."""
+    return tuple(_connected_charge_points)
+
+
+def get_connected_charge_point_id_set():
+    """
+    Get the connected charge point IDs for bulk membership checks.
+
+    Returns a set-like keys view of the current snapshot rather than
+    building a new set.
+    """
+    return _connected_charge_points.keys()
 
 
 def is_charge_point_connected(charge_point_id: str):
@@ -105,21 +172,32 @@ def is_charge_point_connected(charge_point_id: str):
     return charge_point_id in _connected_charge_points
 
 
+_CONNECTION_STATUS_STMT = select(
+    ChargePointModel.id,
+    ChargePointModel.is_online,
+    ChargePointModel.status,
+    ChargePointModel.last_seen,
+    ChargePointModel.vendor,
+    ChargePointModel.model,
+)
+
+
 async def get_database_connection_status():
     """Get connection status from database (works across processes)."""
     try:
         async with AsyncSessionLocal() as session:
-            result = await session.execute(select(ChargePointModel))
-            charge_points = result.scalars().all()
-
-            status_info = {
-                "total_charge_points": len(charge_points),
-                "connected_count": sum(1 for cp in charge_points if cp.is_online),
-                "charge_points": [],
-            }
-
-            for cp in charge_points:
-                status_info["charge_points"].append(
+            # Only the columns reported below are selected; nothing here
+            # touches relationships, so no related rows are loaded
+            result = await session.execute(_CONNECTION_STATUS_STMT)
+
+            # Build the per charge point entries and the online count in a
+            # single pass over the rows
+            charge_points = []
+            connected_count = 0
+            for cp in result:
+                if cp.is_online:
+                    connected_count += 1
+                charge_points.append(
                     {
                         "charge_point_id": cp.id,
                         "connected": cp.is_online,
@@ -131,10 +209,16 @@ async def get_database_connection_status():
                     }
                 )
 
+            status_info = {
+                "total_charge_points": len(charge_points),
+                "connected_count": connected_count,
+                "charge_points": charge_points,
+            }
+
             return status_info
 
     except Exception as e:
-        logger.error(f"Failed to get database connection status: {e}")
+        logger.error("Failed to get database connection status: {}", e)
         return {
             "error": str(e),
             "total_charge_points": 0,
@@ -2,8 +2,15 @@
 Database configuration and session management.
 """
 
+from contextlib import asynccontextmanager
+from contextvars import Context, ContextVar, copy_context
+from typing import Optional
+from uuid import uuid4
+from sqlalchemy import text
+from sqlalchemy.schema import CreateIndex
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession, async_sessionmaker
 from sqlalchemy.orm import DeclarativeBase
+from sqlalchemy.pool import NullPool
 from loguru import logger
 from app.config import (
     DATABASE_URL,
@@ -11,6 +18,9 @@ from app.config import (
     DB_MAX_OVERFLOW,
     DB_POOL_TIMEOUT,
     DB_POOL_RECYCLE,
+    DB_POOL_PRE_PING,
+    DB_USE_NULL_POOL,
+    DB_STATEMENT_CACHE_SIZE,
 )
 
 
@@ -20,15 +30,41 @@ class Base(DeclarativeBase):
     pass
 
 
+# asyncpg connection options: SQLAlchemy's asyncpg dialect prepares every
+# statement and keeps prepared_statement_cache_size of them per connection;
+# statement_cache_size is asyncpg's own cache for queries it prepares itself
+_CONNECT_ARGS = {
+    "prepared_statement_cache_size": DB_STATEMENT_CACHE_SIZE,
+    "statement_cache_size": DB_STATEMENT_CACHE_SIZE,
+}
+# With caching off (PgBouncer in transaction pooling mode) the dialect still
+# names its prepared statements, and a later transaction landing on another
+# server connection can collide with a name left there. Unique names avoid that.
+if DB_STATEMENT_CACHE_SIZE == 0:
+    _CONNECT_ARGS["prepared_statement_name_func"] = lambda: f"__asyncpg_{uuid4()}__"
+
 # Create async engine
-engine = create_async_engine(
-    DATABASE_URL,
-    pool_size=DB_POOL_SIZE,
-    max_overflow=DB_MAX_OVERFLOW,
-    pool_timeout=DB_POOL_TIMEOUT,
-    pool_recycle=DB_POOL_RECYCLE,
-    echo=False,  # Set to True for SQL query logging
-)
+if DB_USE_NULL_POOL:
+    engine = create_async_engine(
+        DATABASE_URL,
+        poolclass=NullPool,
+        connect_args=_CONNECT_ARGS,
+        echo=False,  # Set to True for SQL query logging
+    )
+else:
+    engine = create_async_engine(
+        DATABASE_URL,
+        pool_size=DB_POOL_SIZE,
+        max_overflow=DB_MAX_OVERFLOW,
+        pool_timeout=DB_POOL_TIMEOUT,
+        pool_recycle=DB_POOL_RECYCLE,
+        pool_pre_ping=DB_POOL_PRE_PING,
+        # Reuse the most recently returned connection, so a few warm
+        # connections serve most requests and idle ones can be recycled
+        pool_use_lifo=True,
+        connect_args=_CONNECT_ARGS,
+        echo=False,  # Set to True for SQL query logging
+    )
 
 # Create session factory
 AsyncSessionLocal = async_sessionmaker(
@@ -42,20 +78,111 @@ async def get_db_session():
         try:
             yield session
         except Exception as e:
-            logger.error(f"Database session error: {e}")
+            logger.error("Database session error: {}", e)
             await session.rollback()
             raise
+
+
+# Session opened by shared_session() for the current task, if any
+_current_session: ContextVar[Optional[AsyncSession]] = ContextVar(
+    "current_session", default=None
+)
+
+
+@asynccontextmanager
+async def shared_session():
+    """
+    Open one session that session_scope() reuses for the rest of the block.
+
+    Lets a multi-step flow (e.g. a CLI command that validates a tag and then
+    starts a transaction) run on a single pooled connection. Only for
+    sequential code: an AsyncSession must not be used by concurrent tasks.
+    """
+    current = _current_session.get()
+    if current is not None:
+        yield current
+        return
+
+    async with AsyncSessionLocal() as session:
+        token = _current_session.set(session)
+        try:
+            yield session
         finally:
-            await session.close()
+            _current_session.reset(token)
+
+
+def detached_context() -> Context:
+    """
+    Copy of the current context without the shared session.
+
+    Pass as asyncio.create_task(..., context=detached_context()) for tasks
+    spawned inside shared_session(): the block closes its session while the
+    task may still run, and an AsyncSession must not be shared across tasks.
+    """
+    context = copy_context()
+    context.run(_current_session.set, None)
+    return context
+
+
+@asynccontextmanager
+async def session_scope(session: AsyncSession = None):
+    """
+    Use the given session, or open a new one for the duration of the block.
+
+    Lets callers that already hold a session (e.g. an API request) share it
+    with helpers instead of checking out another pooled connection. Without
+    an explicit session, the one from an enclosing shared_session() is used.
+    """
+    if session is None:
+        session = _current_session.get()
+    if session is not None:
+        yield session
+        return
+
+    async with AsyncSessionLocal() as new_session:
+        yield new_session
+
+
+async def release_connection(session: AsyncSession = None):
+    """
+    End the read transaction of the given or shared session, if one is open.
+
+    Call before awaiting a charge point, so the pooled connection is returned
+    instead of sitting idle in transaction for the whole OCPP round-trip. The
+    session stays usable and checks out a connection again on its next query.
+    """
+    if session is None:
+        session = _current_session.get()
+    if session is not None and session.in_transaction():
+        await session.commit()
 
 
 async def init_db():
     """Initialize the database by creating all tables."""
     # Import all models here to ensure they are registered
-    from app.models import ChargePoint, IdTag, Session, MeterValue
+    from app.models import (
+        ChargePoint,
+        IdTag,
+        Session,
+        MeterValue,
+        ConnectorStatus,
+        transaction_id_seq,
+    )
     
     async with engine.begin() as conn:
         await conn.run_sync(Base.metadata.create_all)
+        # create_all only builds indexes along with a new table, so add the
+        # connector status lookup index to tables that already exist
+        for index in ConnectorStatus.__table__.indexes:
+            await conn.execute(CreateIndex(index, if_not_exists=True))
+        # create_all skips sequences that already exist, so apply the cap
+        # explicitly to databases created before it was added.
+        await conn.execute(
+            text(
+                f"ALTER SEQUENCE {transaction_id_seq.name} "
+                f"MAXVALUE {transaction_id_seq.maxvalue}"
+            )
+        )
         logger.info("Database tables created successfully")
 
 
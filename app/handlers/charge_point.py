@@ -4,91 +4,210 @@ from loguru import logger
 from ocpp.v16 import ChargePoint as ChargePointV16
 from ocpp.v16 import call_result, call
 from ocpp.routing import on
-from app.database import AsyncSessionLocal
+from app.cache import TTLCache
+from app.database import (
+    AsyncSessionLocal,
+    detached_context,
+    session_scope,
+    shared_session,
+)
+from app.id_tags import get_id_tag, is_expired
 from app.models import (
     ChargePoint as ChargePointModel,
-    IdTag,
     Session,
     MeterValue,
     ConnectorStatus,
+    transaction_id_seq,
+)
+from app.utils import (
+    utc_now_iso,
+    utc_now_iso_seconds,
+    utc_now_naive,
+    parse_ocpp_timestamp,
+)
+from app.writers import (
+    boot_recently_persisted,
+    persist_boot_notification,
+    queue_connector_status,
+    queue_meter_values,
+    record_heartbeat,
+    run_in_background,
 )
-from app.utils import utc_now_iso, utc_now_naive, parse_ocpp_timestamp
-from sqlalchemy import select
+from sqlalchemy import Integer, bindparam, insert, select, update
 import random
 
+# Completes the session for a transaction ID, used by StopTransaction. One
+# UPDATE ... RETURNING replaces a SELECT followed by an UPDATE, and
+# energy_consumed (kWh) is computed from the stored meter_start in SQL.
+# Built once so each call reuses the cached compiled statement and the
+# connection's prepared statement.
+_STOP_SESSION_STMT = (
+    update(Session.__table__)
+    .where(Session.transaction_id == bindparam("transaction_id"))
+    .values(
+        meter_stop=bindparam("meter_stop"),
+        stop_timestamp=bindparam("stop_timestamp"),
+        status="Completed",
+        stop_reason=bindparam("stop_reason"),
+        # Meter values are in Wh; energy_consumed is in kWh
+        energy_consumed=(bindparam("meter_stop", type_=Integer) - Session.meter_start)
+        / 1000.0,
+    )
+    .returning(Session.id, Session.energy_consumed)
+)
+# Session primary key for a transaction ID, used by MeterValues
+_SESSION_ID_BY_TRANSACTION_STMT = select(Session.id).where(
+    Session.transaction_id == bindparam("transaction_id")
+)
+
+# Session primary keys of running transactions, filled at StartTransaction
+# and dropped at StopTransaction, so MeterValues for a transaction that
+# started in this process needs no SELECT. Misses fall back to the query.
+_session_id_by_transaction = TTLCache(maxsize=10000, ttl=24 * 3600)
+
+# Core (not ORM) INSERT for meter values, executed with a list of row dicts
+# so no MeterValue objects are built or tracked by the session
+_METER_VALUE_INSERT_STMT = insert(MeterValue.__table__)
+
+# OCPP 1.6 defaults for optional sampledValue fields
+_DEFAULT_UNIT = "Wh"
+_DEFAULT_MEASURAND = "Energy.Active.Import.Register"
+_DEFAULT_LOCATION = "Outlet"
+_DEFAULT_FORMAT = "Raw"
+
+# Next OCPP transaction ID for StartTransaction
+_NEXT_TRANSACTION_ID_STMT = select(transaction_id_seq.next_value())
+
+
+def _meter_value_rows(meter_values, session_id, default_context):
+    """
+    Build MeterValue rows from OCPP meterValue entries.
+
+    Returns one dict per sampled value so all of them can be stored with a
+    single multi-row INSERT. Sampled values that are not numeric are skipped.
+    """
+    rows = []
+    append = rows.append
+    # Shared fallback for entries without a timestamp
+    now = utc_now_naive()
+    for meter_val in meter_values:
+        # Parse timestamp
+        timestamp = meter_val.get("timestamp")
+        if isinstance(timestamp, str):
+            meter_timestamp = parse_ocpp_timestamp(timestamp)
+        else:
+            meter_timestamp = timestamp or now
+
+        # Process each sampled value within this meter value
+        for sampled_val in meter_val.get("sampledValue", ()):
+            get = sampled_val.get
+            value = get("value")
+
+            # Convert value to float for storage
+            try:
+                numeric_value = float(value)
+            except (ValueError, TypeError):
+                logger.error("Invalid meter value: {}", value)
+                continue
+
+            append(
+                {
+                    "session_id": session_id,
+                    "timestamp": meter_timestamp,
+                    "value": numeric_value,
+                    "unit": get("unit", _DEFAULT_UNIT),
+                    "measurand": get("measurand", _DEFAULT_MEASURAND),
+                    "phase": get("phase"),
+                    "location": get("location", _DEFAULT_LOCATION),
+                    "context": get("context", default_context),
+                    "format": get("format", _DEFAULT_FORMAT),
+                }
+            )
+    return rows
+
+
+def _id_tag_info(id_tag, tag_record):
+    """Build the OCPP idTagInfo for a looked-up ID tag row (None if unknown)."""
+    # Default response for unknown/invalid tags
+    id_tag_info = {"status": "Invalid"}
+
+    if tag_record:
+        # Check if tag is expired
+        if is_expired(tag_record):
+            id_tag_info = {
+                "status": "Expired",
+                "expiryDate": tag_record.expiry_date.isoformat(),
+            }
+            logger.debug("ID tag {} is expired", id_tag)
+        else:
+            # Use the tag's current status
+            id_tag_info = {"status": tag_record.status}
+
+            # Add optional fields if present
+            if tag_record.expiry_date:
+                id_tag_info["expiryDate"] = tag_record.expiry_date.isoformat()
+            if tag_record.parent_id_tag:
+                id_tag_info["parentIdTag"] = tag_record.parent_id_tag
+
+            logger.debug(
+                "ID tag {} authorized with status: {}", id_tag, tag_record.status
+            )
+    else:
+        logger.debug("ID tag {} not found in database", id_tag)
+
+    return id_tag_info
+
 
 class ChargePoint(ChargePointV16):
     """
     Custom ChargePoint class for handling OCPP 1.6 messages.
     """
 
+    async def route_message(self, raw_msg):
+        """
+        Route an incoming message with one database session for its handler.
+
+        The handler and the helpers it calls (ID tag lookups, transaction ID
+        generation) share the session through session_scope() instead of each
+        opening their own. A fresh session per message, rather than one per
+        connection, keeps ORM objects from going stale between messages.
+        """
+        async with shared_session():
+            await super().route_message(raw_msg)
+
     @on("BootNotification")
     async def on_boot_notification(
         self, charge_point_vendor, charge_point_model, **kwargs
     ):
         logger.info(
-            f"BootNotification received from {self.id}: vendor={charge_point_vendor}, model={charge_point_model}"
+            "BootNotification received from {}: vendor={}, model={}",
+            self.id,
+            charge_point_vendor,
+            charge_point_model,
         )
 
-        # Store/update charge point in database
-        async with AsyncSessionLocal() as session:
-            try:
-                # Check if charge point already exists
-                charge_point = await session.get(ChargePointModel, self.id)
-
-                if charge_point is None:
-                    # Create new charge point
-                    charge_point = ChargePointModel(
-                        id=self.id,
-                        vendor=charge_point_vendor,
-                        model=charge_point_model,
-                        charge_point_serial_number=kwargs.get(
-                            "charge_point_serial_number"
-                        ),
-                        charge_box_serial_number=kwargs.get("charge_box_serial_number"),
-                        firmware_version=kwargs.get("firmware_version"),
-                        iccid=kwargs.get("iccid"),
-                        imsi=kwargs.get("imsi"),
-                        meter_type=kwargs.get("meter_type"),
-                        meter_serial_number=kwargs.get("meter_serial_number"),
-                        is_online=True,
-                        last_seen=utc_now_naive(),
-                        boot_status="Accepted",
-                    )
-                    session.add(charge_point)
-                    logger.info(f"Created new charge point: {self.id}")
-                else:
-                    # Update existing charge point
-                    charge_point.vendor = charge_point_vendor
-                    charge_point.model = charge_point_model
-                    charge_point.charge_point_serial_number = kwargs.get(
-                        "charge_point_serial_number"
-                    )
-                    charge_point.charge_box_serial_number = kwargs.get(
-                        "charge_box_serial_number"
-                    )
-                    charge_point.firmware_version = kwargs.get("firmware_version")
-                    charge_point.iccid = kwargs.get("iccid")
-                    charge_point.imsi = kwargs.get("imsi")
-                    charge_point.meter_type = kwargs.get("meter_type")
-                    charge_point.meter_serial_number = kwargs.get("meter_serial_number")
-                    charge_point.is_online = True
-                    charge_point.last_seen = utc_now_naive()
-                    charge_point.boot_status = "Accepted"
-                    charge_point.updated_at = utc_now_naive()
-                    logger.info(f"Updated existing charge point: {self.id}")
-
-                await session.commit()
-                logger.info(f"BootNotification data stored in database for {self.id}")
-
-            except Exception as e:
-                logger.error(f"Failed to store BootNotification data: {e}")
-                await session.rollback()
-                # Continue with response even if DB fails
+        # Store/update charge point in the background so the response does
+        # not wait on the database
+        boot_values = {
+            "vendor": charge_point_vendor,
+            "model": charge_point_model,
+            "charge_point_serial_number": kwargs.get("charge_point_serial_number"),
+            "charge_box_serial_number": kwargs.get("charge_box_serial_number"),
+            "firmware_version": kwargs.get("firmware_version"),
+            "iccid": kwargs.get("iccid"),
+            "imsi": kwargs.get("imsi"),
+            "meter_type": kwargs.get("meter_type"),
+            "meter_serial_number": kwargs.get("meter_serial_number"),
+            "boot_status": "Accepted",
+        }
+        if boot_recently_persisted(self.id, boot_values):
+            logger.debug("Skipping store of repeat BootNotification from {}", self.id)
+        else:
+            await run_in_background(persist_boot_notification, self.id, boot_values)
 
         # Return OCPP 1.6 compliant response
         return call_result.BootNotification(
-            current_time=utc_now_iso(),
+            current_time=utc_now_iso_seconds(),
             interval=300,  # Heartbeat interval in seconds
             status="Accepted",
         )
@@ -96,36 +215,22 @@ class ChargePoint(ChargePointV16):
     @on("Heartbeat")
     async def on_heartbeat(self):
         """Handle Heartbeat requests - update last_seen timestamp."""
-        logger.info(f"Heartbeat received from {self.id}")
-
-        # Update last_seen timestamp in database
-        async with AsyncSessionLocal() as session:
-            try:
-                charge_point = await session.get(ChargePointModel, self.id)
+        logger.debug("Heartbeat received from {}", self.id)
 
-                if charge_point:
-                    charge_point.last_seen = utc_now_naive()
-                    charge_point.is_online = True
-                    charge_point.updated_at = utc_now_naive()
-                    await session.commit()
-                    logger.debug(f"Updated last_seen for charge point {self.id}")
-                else:
-                    logger.warning(
-                        f"Received heartbeat from unknown charge point: {self.id}"
-                    )
-
-            except Exception as e:
-                logger.error(f"Failed to update heartbeat timestamp: {e}")
-                await session.rollback()
-                # Continue with response even if DB fails
+        # Queue the last_seen update; a background writer batches heartbeats
+        # from all charge points into one UPDATE every few seconds, and
+        # heartbeats within LAST_SEEN_WRITE_INTERVAL of the last one are dropped
+        record_heartbeat(self.id, utc_now_naive())
 
         # Return OCPP 1.6 compliant response with current time
-        return call_result.Heartbeat(current_time=utc_now_iso())
+        return call_result.Heartbeat(current_time=utc_now_iso_seconds())
 
     @on("Authorize")
     async def on_authorize(self, id_tag):
         """Handle Authorize requests - validate ID tag against database."""
-        logger.info(f"Authorize request received from {self.id} for idTag: {id_tag}")
+        logger.debug(
+            "Authorize request received from {} for idTag: {}", self.id, id_tag
+        )
 
         # Get ID tag info (reuse logic from authorize)
         id_tag_info = await self._get_id_tag_info(id_tag)
@@ -139,64 +244,71 @@ class ChargePoint(ChargePointV16):
     ):
         """Handle StartTransaction requests - create new charging session."""
         logger.info(
-            f"StartTransaction received from {self.id}: connector={connector_id}, idTag={id_tag}, meterStart={meter_start}"
+            "StartTransaction received from {}: connector={}, idTag={}, meterStart={}",
+            self.id,
+            connector_id,
+            id_tag,
+            meter_start,
         )
 
-        # Get ID tag info and validate authorization
-        id_tag_info = await self._get_id_tag_info(id_tag)
-
         # Default transaction ID (will be updated if session is created)
         transaction_id = 0
 
-        # Only create session if tag is accepted
-        if id_tag_info["status"] == "Accepted":
-            async with AsyncSessionLocal() as session:
-                try:
-                    # Get the ID tag record
-                    tag_result = await session.execute(
-                        select(IdTag).where(IdTag.tag == id_tag)
-                    )
-                    tag_record = tag_result.scalar_one_or_none()
-
-                    if tag_record:
-                        # Generate unique transaction ID
-                        transaction_id = await self._generate_transaction_id(session)
+        async with session_scope() as session:
+            # One lookup serves both the authorization check and the new
+            # session's id_tag_id
+            try:
+                tag_record = await get_id_tag(id_tag, session=session)
+            except Exception as e:
+                logger.error("Failed to lookup ID tag {}: {}", id_tag, e)
+                tag_record = None
+            id_tag_info = _id_tag_info(id_tag, tag_record)
 
-                        # Parse timestamp
-                        if isinstance(timestamp, str):
-                            start_time = parse_ocpp_timestamp(timestamp)
-                        else:
-                            start_time = timestamp
-
-                        # Create new session
-                        new_session = Session(
-                            transaction_id=transaction_id,
-                            charge_point_id=self.id,
-                            id_tag_id=tag_record.id,
-                            connector_id=connector_id,
-                            meter_start=meter_start,
-                            start_timestamp=start_time,
-                            status="Active",
-                            reservation_id=kwargs.get("reservation_id"),
-                        )
-                        session.add(new_session)
-                        await session.commit()
+            # Only create session if tag is accepted
+            if id_tag_info["status"] == "Accepted":
+                try:
+                    # Generate unique transaction ID
+                    transaction_id = await self._generate_transaction_id(session)
 
-                        logger.info(
-                            f"Created session {transaction_id} for {self.id} connector {connector_id}"
-                        )
+                    # Parse timestamp
+                    if isinstance(timestamp, str):
+                        start_time = parse_ocpp_timestamp(timestamp)
                     else:
-                        logger.error(f"ID tag {id_tag} not found when creating session")
-                        id_tag_info = {"status": "Invalid"}
+                        start_time = timestamp
+
+                    # Create new session
+                    new_session = Session(
+                        transaction_id=transaction_id,
+                        charge_point_id=self.id,
+                        id_tag_id=tag_record.id,
+                        connector_id=connector_id,
+                        meter_start=meter_start,
+                        start_timestamp=start_time,
+                        status="Active",
+                        reservation_id=kwargs.get("reservation_id"),
+                    )
+                    session.add(new_session)
+                    await session.commit()
+                    _session_id_by_transaction.set(transaction_id, new_session.id)
+
+                    logger.info(
+                        "Created session {} for {} connector {}",
+                        transaction_id,
+                        self.id,
+                        connector_id,
+                    )
 
                 except Exception as e:
-                    logger.error(f"Failed to create session: {e}")
+                    logger.error("Failed to create session: {}", e)
                     await session.rollback()
+                    transaction_id = 0
                     id_tag_info = {"status": "Invalid"}
-        else:
-            logger.info(
-                f"StartTransaction rejected for {id_tag}: {id_tag_info['status']}"
-            )
+            else:
+                logger.info(
+                    "StartTransaction rejected for {}: {}",
+                    id_tag,
+                    id_tag_info["status"],
+                )
 
         # Return OCPP 1.6 compliant response
         return call_result.StartTransaction(
@@ -208,88 +320,20 @@ class ChargePoint(ChargePointV16):
         """Handle MeterValues requests - store meter readings during charging sessions."""
         transaction_id = kwargs.get("transaction_id")
 
-        logger.info(
-            f"MeterValues received from {self.id}: connector={connector_id}, "
-            f"transaction_id={transaction_id}, values_count={len(meter_value)}"
+        logger.debug(
+            "MeterValues received from {}: connector={}, transaction_id={}, "
+            "values_count={}",
+            self.id,
+            connector_id,
+            transaction_id,
+            len(meter_value),
         )
 
-        # Store meter values in database
-        async with AsyncSessionLocal() as session:
-            try:
-                # If transaction_id is provided, verify it exists and get the session
-                session_record = None
-                if transaction_id:
-                    session_result = await session.execute(
-                        select(Session).where(Session.transaction_id == transaction_id)
-                    )
-                    session_record = session_result.scalar_one_or_none()
-
-                    if not session_record:
-                        logger.warning(
-                            f"Transaction {transaction_id} not found for MeterValues from {self.id}"
-                        )
-
-                # Process each meter value
-                for meter_val in meter_value:
-                    # Parse timestamp
-                    timestamp = meter_val.get("timestamp")
-                    if isinstance(timestamp, str):
-                        meter_timestamp = parse_ocpp_timestamp(timestamp)
-                    else:
-                        meter_timestamp = timestamp or utc_now_naive()
-
-                    # Process each sampled value within this meter value
-                    sampled_values = meter_val.get("sampledValue", [])
-
-                    for sampled_val in sampled_values:
-                        # Extract sampled value fields
-                        value = sampled_val.get("value")
-                        context = sampled_val.get("context", "Sample.Periodic")
-                        format_type = sampled_val.get("format", "Raw")
-                        measurand = sampled_val.get(
-                            "measurand", "Energy.Active.Import.Register"
-                        )
-                        phase = sampled_val.get("phase")
-                        location = sampled_val.get("location", "Outlet")
-                        unit = sampled_val.get("unit", "Wh")
-
-                        # Convert value to float for storage
-                        try:
-                            numeric_value = float(value)
-                        except (ValueError, TypeError):
-                            logger.error(f"Invalid meter value: {value}")
-                            continue
-
-                        # Create MeterValue record
-                        meter_value_record = MeterValue(
-                            session_id=session_record.id if session_record else None,
-                            timestamp=meter_timestamp,
-                            value=numeric_value,
-                            unit=unit,
-                            measurand=measurand,
-                            phase=phase,
-                            location=location,
-                            context=context,
-                            format=format_type,
-                        )
-
-                        session.add(meter_value_record)
-
-                        logger.debug(
-                            f"Stored meter value: {numeric_value} {unit} "
-                            f"({measurand}) at {meter_timestamp}"
-                        )
-
-                await session.commit()
-                logger.info(
-                    f"Successfully stored {len(meter_value)} meter value sets "
-                    f"from {self.id} connector {connector_id}"
-                )
-
-            except Exception as e:
-                logger.error(f"Failed to store meter values: {e}")
-                await session.rollback()
-                # Continue with response even if DB fails
+        # Store meter values in the background; the response does not
+        # depend on the database
+        await run_in_background(
+            self._store_meter_values, connector_id, transaction_id, meter_value
+        )
 
         # Return OCPP 1.6 compliant response (empty response)
         return call_result.MeterValues()
@@ -304,8 +348,12 @@ class ChargePoint(ChargePointV16):
         transaction_data = kwargs.get("transaction_data", [])
 
         logger.info(
-            f"StopTransaction received from {self.id}: transaction_id={transaction_id}, "
-            f"meter_stop={meter_stop}, reason={reason}, id_tag={id_tag}"
+            "StopTransaction received from {}: transaction_id={}, meter_stop={}, reason={}, id_tag={}",
+            self.id,
+            transaction_id,
+            meter_stop,
+            reason,
+            id_tag,
         )
 
         # Default response (no idTagInfo)
@@ -318,111 +366,71 @@ class ChargePoint(ChargePointV16):
             stop_time = timestamp
 
         # Update session in database
-        async with AsyncSessionLocal() as session:
+        async with session_scope() as session:
             try:
-                # Find the session by transaction_id
+                # Complete the session and read back its id in one round-trip
                 session_result = await session.execute(
-                    select(Session).where(Session.transaction_id == transaction_id)
+                    _STOP_SESSION_STMT,
+                    {
+                        "transaction_id": transaction_id,
+                        "meter_stop": meter_stop,
+                        "stop_timestamp": stop_time,
+                        "stop_reason": reason,
+                    },
                 )
-                session_record = session_result.scalar_one_or_none()
+                session_record = session_result.one_or_none()
 
                 if not session_record:
                     logger.error(
-                        f"Transaction {transaction_id} not found for StopTransaction from {self.id}"
+                        "Transaction {} not found for StopTransaction from {}",
+                        transaction_id,
+                        self.id,
                     )
                     # Still return success response as per OCPP spec
                 else:
-                    # Update session with stop data
-                    session_record.meter_stop = meter_stop
-                    session_record.stop_timestamp = stop_time
-                    session_record.status = "Completed"
-                    session_record.stop_reason = reason
-                    session_record.updated_at = utc_now_naive()
-
-                    # Calculate energy consumed if we have both start and stop values
-                    if session_record.meter_start is not None:
-                        # Convert from Wh to kWh for energy_consumed field
-                        energy_wh = meter_stop - session_record.meter_start
-                        session_record.energy_consumed = energy_wh / 1000.0
+                    # No more meter values are expected for this transaction
+                    _session_id_by_transaction.pop(transaction_id)
 
                     logger.info(
-                        f"Updated session {transaction_id}: meter_stop={meter_stop}, "
-                        f"energy_consumed={session_record.energy_consumed} kWh"
+                        "Updated session {}: meter_stop={}, energy_consumed={} kWh",
+                        transaction_id,
+                        meter_stop,
+                        session_record.energy_consumed,
                     )
 
                 # Process transaction data (additional meter values) if provided
                 if transaction_data:
                     logger.info(
-                        f"Processing {len(transaction_data)} transaction data entries"
+                        "Processing {} transaction data entries", len(transaction_data)
                     )
 
-                    for meter_val in transaction_data:
-                        # Parse timestamp
-                        data_timestamp = meter_val.get("timestamp")
-                        if isinstance(data_timestamp, str):
-                            meter_timestamp = parse_ocpp_timestamp(data_timestamp)
-                        else:
-                            meter_timestamp = data_timestamp or utc_now_naive()
-
-                        # Process each sampled value
-                        sampled_values = meter_val.get("sampledValue", [])
-
-                        for sampled_val in sampled_values:
-                            # Extract sampled value fields
-                            value = sampled_val.get("value")
-                            context = sampled_val.get("context", "Transaction.End")
-                            format_type = sampled_val.get("format", "Raw")
-                            measurand = sampled_val.get(
-                                "measurand", "Energy.Active.Import.Register"
-                            )
-                            phase = sampled_val.get("phase")
-                            location = sampled_val.get("location", "Outlet")
-                            unit = sampled_val.get("unit", "Wh")
-
-                            # Convert value to float for storage
-                            try:
-                                numeric_value = float(value)
-                            except (ValueError, TypeError):
-                                logger.error(f"Invalid transaction data value: {value}")
-                                continue
-
-                            # Create MeterValue record
-                            meter_value_record = MeterValue(
-                                session_id=(
-                                    session_record.id if session_record else None
-                                ),
-                                timestamp=meter_timestamp,
-                                value=numeric_value,
-                                unit=unit,
-                                measurand=measurand,
-                                phase=phase,
-                                location=location,
-                                context=context,
-                                format=format_type,
-                            )
-
-                            session.add(meter_value_record)
-
-                            logger.debug(
-                                f"Stored transaction data: {numeric_value} {unit} "
-                                f"({measurand}) at {meter_timestamp}"
-                            )
+                    rows = _meter_value_rows(
+                        transaction_data,
+                        session_record.id if session_record else None,
+                        "Transaction.End",
+                    )
+                    if rows:
+                        await session.execute(_METER_VALUE_INSERT_STMT, rows)
+                        logger.debug("Stored {} transaction data values", len(rows))
 
                 # Validate idTag if provided and add to response
                 if id_tag:
                     id_tag_info = await self._get_id_tag_info(id_tag)
                     response_data["id_tag_info"] = id_tag_info
                     logger.info(
-                        f"ID tag {id_tag} validation for stop: {id_tag_info['status']}"
+                        "ID tag {} validation for stop: {}",
+                        id_tag,
+                        id_tag_info["status"],
                     )
 
                 await session.commit()
                 logger.info(
-                    f"Successfully processed StopTransaction for transaction {transaction_id}"
+                    "Successfully processed StopTransaction for transaction {}",
+                    transaction_id,
                 )
 
             except Exception as e:
-                logger.error(f"Failed to process StopTransaction: {e}")
+                logger.error("Failed to process StopTransaction: {}", e)
                 await session.rollback()
                 # Continue with response even if DB fails - OCPP spec requirement
 
@@ -438,8 +446,12 @@ class ChargePoint(ChargePointV16):
         vendor_error_code = kwargs.get("vendor_error_code")
 
         logger.info(
-            f"StatusNotification received from {self.id}: connector_id={connector_id}, "
-            f"status={status}, error_code={error_code}, info={info}"
+            "StatusNotification received from {}: connector_id={}, status={}, error_code={}, info={}",
+            self.id,
+            connector_id,
+            status,
+            error_code,
+            info,
         )
 
         # Parse timestamp if provided
@@ -459,69 +471,47 @@ class ChargePoint(ChargePointV16):
             # Use current UTC time as timezone-naive
             status_timestamp = utc_now_naive()
 
-        # Store status notification in database
-        async with AsyncSessionLocal() as session:
-            try:
-                # Verify charge point exists
-                charge_point = await session.get(ChargePointModel, self.id)
-                if not charge_point:
-                    logger.warning(
-                        f"Received StatusNotification from unknown charge point: {self.id}"
-                    )
-                    # Still process the notification for logging purposes
-
-                # Create status notification record
-                status_record = ConnectorStatus(
-                    charge_point_id=self.id,
-                    connector_id=connector_id,
-                    status=status,
-                    error_code=error_code,
-                    timestamp=status_timestamp,
-                    info=info,
-                    vendor_id=vendor_id,
-                    vendor_error_code=vendor_error_code,
-                )
-
-                session.add(status_record)
-
-                # Update charge point's overall status if this is connector 0
-                if connector_id == 0 and charge_point:
-                    charge_point.status = status
-                    charge_point.updated_at = utc_now_naive()
-                    logger.info(
-                        f"Updated charge point {self.id} overall status to: {status}"
-                    )
-
-                await session.commit()
-                logger.info(
-                    f"Stored StatusNotification for {self.id} connector {connector_id}: "
-                    f"{status} ({error_code})"
-                )
-
-                # Log important status changes
-                if error_code != "NoError":
-                    logger.warning(
-                        f"Connector {connector_id} on {self.id} reported error: "
-                        f"{error_code} - {info or 'No additional info'}"
-                    )
+        # Queue the status record; a background writer batches StatusNotifications
+        # from all charge points and also updates the charge point's overall
+        # status for connector 0
+        await queue_connector_status(
+            {
+                "charge_point_id": self.id,
+                "connector_id": connector_id,
+                "status": status,
+                "error_code": error_code,
+                "timestamp": status_timestamp,
+                "info": info,
+                "vendor_id": vendor_id,
+                "vendor_error_code": vendor_error_code,
+            }
+        )
 
-                # Log status transitions that indicate charging activity
-                if status in [
-                    "Preparing",
-                    "Charging",
-                    "SuspendedEV",
-                    "SuspendedEVSE",
-                    "Finishing",
-                ]:
-                    logger.info(
-                        f"Connector {connector_id} on {self.id} is now {status} "
-                        f"({info or 'No additional info'})"
-                    )
+        # Log important status changes
+        if error_code != "NoError":
+            logger.warning(
+                "Connector {} on {} reported error: {} - {}",
+                connector_id,
+                self.id,
+                error_code,
+                info or "No additional info",
+            )
 
-            except Exception as e:
-                logger.error(f"Failed to store StatusNotification: {e}")
-                await session.rollback()
-                # Continue with response even if DB fails
+        # Log status transitions that indicate charging activity
+        if status in [
+            "Preparing",
+            "Charging",
+            "SuspendedEV",
+            "SuspendedEVSE",
+            "Finishing",
+        ]:
+            logger.info(
+                "Connector {} on {} is now {} ({})",
+                connector_id,
+                self.id,
+                status,
+                info or "No additional info",
+            )
 
         # Return OCPP 1.6 compliant response (empty response)
         return call_result.StatusNotification()
@@ -533,21 +523,25 @@ class ChargePoint(ChargePointV16):
         charging_profile = kwargs.get("charging_profile")
 
         logger.info(
-            f"RemoteStartTransaction received from Central System for {self.id}: "
-            f"idTag={id_tag}, connectorId={connector_id}"
+            "RemoteStartTransaction received from Central System for {}: idTag={}, connectorId={}",
+            self.id,
+            id_tag,
+            connector_id,
         )
 
         # Default response status
         status = "Rejected"
 
-        async with AsyncSessionLocal() as session:
+        async with session_scope() as session:
             try:
                 # Validate the ID tag first
                 id_tag_info = await self._get_id_tag_info(id_tag)
 
                 if id_tag_info["status"] != "Accepted":
                     logger.info(
-                        f"RemoteStartTransaction rejected for {id_tag}: {id_tag_info['status']}"
+                        "RemoteStartTransaction rejected for {}: {}",
+                        id_tag,
+                        id_tag_info["status"],
                     )
                     status = "Rejected"
                 else:
@@ -555,7 +549,8 @@ class ChargePoint(ChargePointV16):
                     charge_point = await session.get(ChargePointModel, self.id)
                     if not charge_point or not charge_point.is_online:
                         logger.warning(
-                            f"RemoteStartTransaction rejected: charge point {self.id} is offline"
+                            "RemoteStartTransaction rejected: charge point {} is offline",
+                            self.id,
                         )
                         status = "Rejected"
                     else:
@@ -576,14 +571,16 @@ class ChargePoint(ChargePointV16):
                                 "Preparing",
                             ]:
                                 logger.info(
-                                    f"RemoteStartTransaction rejected: connector {connector_id} "
-                                    f"is {latest_status.status}"
+                                    "RemoteStartTransaction rejected: connector {} is {}",
+                                    connector_id,
+                                    latest_status.status,
                                 )
                                 status = "Rejected"
                             else:
                                 status = "Accepted"
                                 logger.info(
-                                    f"RemoteStartTransaction accepted for connector {connector_id}"
+                                    "RemoteStartTransaction accepted for connector {}",
+                                    connector_id,
                                 )
                         else:
                             # No specific connector requested - find an available one
@@ -601,19 +598,21 @@ class ChargePoint(ChargePointV16):
 
                         if status == "Accepted":
                             logger.info(
-                                f"Charge point {self.id} should now prepare for transaction "
-                                f"with idTag {id_tag}"
+                                "Charge point {} should now prepare for transaction with idTag {}",
+                                self.id,
+                                id_tag,
                             )
 
                             # Log charging profile if provided
                             if charging_profile:
                                 logger.info(
-                                    f"Charging profile provided: ID={charging_profile.get('chargingProfileId')}, "
-                                    f"purpose={charging_profile.get('chargingProfilePurpose')}"
+                                    "Charging profile provided: ID={}, purpose={}",
+                                    charging_profile.get("chargingProfileId"),
+                                    charging_profile.get("chargingProfilePurpose"),
                                 )
 
             except Exception as e:
-                logger.error(f"Failed to process RemoteStartTransaction: {e}")
+                logger.error("Failed to process RemoteStartTransaction: {}", e)
                 await session.rollback()
                 status = "Rejected"
 
@@ -632,14 +631,15 @@ class ChargePoint(ChargePointV16):
         - If Accepted, automatically trigger StopTransaction flow
         """
         logger.info(
-            f"RemoteStopTransaction received from Central System for {self.id}: "
-            f"transactionId={transaction_id}"
+            "RemoteStopTransaction received from Central System for {}: transactionId={}",
+            self.id,
+            transaction_id,
         )
 
         # Default response status
         status = "Rejected"
 
-        async with AsyncSessionLocal() as session:
+        async with session_scope() as session:
             try:
                 # Validate that the transaction exists and is active
                 session_result = await session.execute(
@@ -651,22 +651,25 @@ class ChargePoint(ChargePointV16):
 
                 if not session_record:
                     logger.info(
-                        f"RemoteStopTransaction rejected: transaction {transaction_id} "
-                        f"not found for charge point {self.id}"
+                        "RemoteStopTransaction rejected: transaction {} not found for charge point {}",
+                        transaction_id,
+                        self.id,
                     )
                     status = "Rejected"
                 elif session_record.status != "Active":
                     logger.info(
-                        f"RemoteStopTransaction rejected: transaction {transaction_id} "
-                        f"is not active (status: {session_record.status})"
+                        "RemoteStopTransaction rejected: transaction {} is not active (status: {})",
+                        transaction_id,
+                        session_record.status,
                     )
                     status = "Rejected"
                 else:
                     # Transaction exists and is active - accept the request
                     status = "Accepted"
                     logger.info(
-                        f"RemoteStopTransaction accepted for transaction {transaction_id} "
-                        f"on connector {session_record.connector_id}"
+                        "RemoteStopTransaction accepted for transaction {} on connector {}",
+                        transaction_id,
+                        session_record.connector_id,
                     )
 
                     # According to OCPP spec: "This remote request to stop a transaction
@@ -680,11 +683,12 @@ class ChargePoint(ChargePointV16):
                             transaction_id,
                             session_record.connector_id,
                             session_record.meter_start or 0,
-                        )
+                        ),
+                        context=detached_context(),
                     )
 
             except Exception as e:
-                logger.error(f"Failed to process RemoteStopTransaction: {e}")
+                logger.error("Failed to process RemoteStopTransaction: {}", e)
                 await session.rollback()
                 status = "Rejected"
 
@@ -707,20 +711,22 @@ class ChargePoint(ChargePointV16):
         MVP: Single ChargePoint with single Connector (connector_id = 1)
         """
         logger.info(
-            f"ChangeAvailability received from Central System for {self.id}: "
-            f"connectorId={connector_id}, type={type}"
+            "ChangeAvailability received from Central System for {}: connectorId={}, type={}",
+            self.id,
+            connector_id,
+            type,
         )
 
         # Default response status
         status = "Rejected"
 
-        async with AsyncSessionLocal() as session:
+        async with session_scope() as session:
             try:
                 # MVP: Validate connector_id (0 = ChargePoint, 1 = single connector)
                 if connector_id < 0 or connector_id > 1:
                     logger.info(
-                        f"ChangeAvailability rejected: invalid connector_id {connector_id} "
-                        f"(MVP supports 0=ChargePoint, 1=connector)"
+                        "ChangeAvailability rejected: invalid connector_id {} (MVP supports 0=ChargePoint, 1=connector)",
+                        connector_id,
                     )
                     status = "Rejected"
                 else:
@@ -744,7 +750,7 @@ class ChargePoint(ChargePointV16):
                         # with availability status 'Scheduled'"
                         status = "Scheduled"
                         logger.info(
-                            f"ChangeAvailability scheduled: transaction in progress on connector 1"
+                            "ChangeAvailability scheduled: transaction in progress on connector 1"
                         )
                     else:
                         # Get current availability state(s)
@@ -764,7 +770,7 @@ class ChargePoint(ChargePointV16):
                                 .where(
                                     ConnectorStatus.connector_id == target_connector_id
                                 )
-                                .order_by(ConnectorStatus.created_at.desc())
+                                .order_by(ConnectorStatus.timestamp.desc())
                                 .limit(1)
                             )
                             current_status = current_status_result.scalar_one_or_none()
@@ -782,7 +788,7 @@ class ChargePoint(ChargePointV16):
                             # availability status 'Accepted'"
                             status = "Accepted"
                             logger.info(
-                                f"ChangeAvailability accepted: already in {type} state"
+                                "ChangeAvailability accepted: already in {} state", type
                             )
                         else:
                             # Apply availability change immediately
@@ -795,7 +801,7 @@ class ChargePoint(ChargePointV16):
                                         ConnectorStatus.connector_id
                                         == target_connector_id
                                     )
-                                    .order_by(ConnectorStatus.created_at.desc())
+                                    .order_by(ConnectorStatus.timestamp.desc())
                                     .limit(1)
                                 )
                                 latest_status = (
@@ -824,8 +830,9 @@ class ChargePoint(ChargePointV16):
                             await session.commit()
                             status = "Accepted"
                             logger.info(
-                                f"ChangeAvailability accepted: updated connector(s) {target_connectors} "
-                                f"to {type}"
+                                "ChangeAvailability accepted: updated connector(s) {} to {}",
+                                target_connectors,
+                                type,
                             )
 
                             # Schedule StatusNotification to be sent after response
@@ -835,11 +842,12 @@ class ChargePoint(ChargePointV16):
                             asyncio.create_task(
                                 self._send_availability_status_notifications(
                                     target_connectors, type
-                                )
+                                ),
+                                context=detached_context(),
                             )
 
             except Exception as e:
-                logger.error(f"Failed to process ChangeAvailability: {e}")
+                logger.error("Failed to process ChangeAvailability: {}", e)
                 await session.rollback()
                 status = "Rejected"
 
@@ -863,8 +871,11 @@ class ChargePoint(ChargePointV16):
             meter_stop = meter_start + random.randint(1000, 5000)  # Add 1-5 kWh
 
             logger.info(
-                f"Automatically stopping transaction {transaction_id} on connector {connector_id} "
-                f"(meter: {meter_start} -> {meter_stop} Wh)"
+                "Automatically stopping transaction {} on connector {} (meter: {} -> {} Wh)",
+                transaction_id,
+                connector_id,
+                meter_start,
+                meter_stop,
             )
 
             # Send StopTransaction request as required by OCPP spec
@@ -877,8 +888,8 @@ class ChargePoint(ChargePointV16):
 
             response = await self.call(request)
             logger.info(
-                f"Automatic StopTransaction sent for transaction {transaction_id}: "
-                f"response received"
+                "Automatic StopTransaction sent for transaction {}: response received",
+                transaction_id,
             )
 
             # Send StatusNotification to indicate connector is now available
@@ -895,78 +906,64 @@ class ChargePoint(ChargePointV16):
 
             await self.call(status_request)
             logger.info(
-                f"StatusNotification sent: connector {connector_id} now Available "
-                f"after remote stop"
+                "StatusNotification sent: connector {} now Available after remote stop",
+                connector_id,
             )
 
         except Exception as e:
             logger.error(
-                f"Failed to send automatic StopTransaction for {transaction_id}: {e}"
+                "Failed to send automatic StopTransaction for {}: {}", transaction_id, e
             )
 
-    async def _get_id_tag_info(self, id_tag):
-        """Helper method to get ID tag info (shared between Authorize and StartTransaction)."""
-        # Default response for unknown/invalid tags
-        id_tag_info = {"status": "Invalid"}
-
-        # Look up ID tag in database
-        async with AsyncSessionLocal() as session:
-            try:
-                # Query for the ID tag
-                result = await session.execute(select(IdTag).where(IdTag.tag == id_tag))
-                tag_record = result.scalar_one_or_none()
-
-                if tag_record:
-                    # Check if tag is expired
-                    if (
-                        tag_record.expiry_date
-                        and tag_record.expiry_date < utc_now_naive()
-                    ):
-                        id_tag_info = {
-                            "status": "Expired",
-                            "expiryDate": tag_record.expiry_date.isoformat(),
-                        }
-                        logger.info(f"ID tag {id_tag} is expired")
-                    else:
-                        # Use the tag's current status
-                        id_tag_info = {"status": tag_record.status}
-
-                        # Add optional fields if present
-                        if tag_record.expiry_date:
-                            id_tag_info["expiryDate"] = (
-                                tag_record.expiry_date.isoformat()
-                            )
-                        if tag_record.parent_id_tag:
-                            id_tag_info["parentIdTag"] = tag_record.parent_id_tag
+    async def _store_meter_values(self, connector_id, transaction_id, meter_value):
+        """Queue a MeterValues message's sampled values for the batch writer."""
+        # If transaction_id is provided, verify it exists and get the session
+        session_id = None
+        if transaction_id:
+            session_id = _session_id_by_transaction.get(transaction_id)
+            if session_id is None:
+                # Own session: this runs after the message's shared session is closed
+                async with AsyncSessionLocal() as session:
+                    session_id = await session.scalar(
+                        _SESSION_ID_BY_TRANSACTION_STMT,
+                        {"transaction_id": transaction_id},
+                    )
+                if session_id is not None:
+                    _session_id_by_transaction.set(transaction_id, session_id)
+
+            if session_id is None:
+                logger.warning(
+                    "Transaction {} not found for MeterValues from {}",
+                    transaction_id,
+                    self.id,
+                )
 
-                        logger.info(
-                            f"ID tag {id_tag} authorized with status: {tag_record.status}"
-                        )
-                else:
-                    logger.info(f"ID tag {id_tag} not found in database")
+        rows = _meter_value_rows(meter_value, session_id, "Sample.Periodic")
+        await queue_meter_values(rows)
+        logger.debug(
+            "Queued {} meter values from {} connector {}",
+            len(rows),
+            self.id,
+            connector_id,
+        )
 
-            except Exception as e:
-                logger.error(f"Failed to lookup ID tag {id_tag}: {e}")
-                # Return Invalid status on database error
-                id_tag_info = {"status": "Invalid"}
+    async def _get_id_tag_info(self, id_tag):
+        """Helper method to get ID tag info (shared by Authorize, StopTransaction and RemoteStart)."""
+        try:
+            # Look up ID tag (cached, so repeat authorizations skip the database)
+            tag_record = await get_id_tag(id_tag)
+        except Exception as e:
+            logger.error("Failed to lookup ID tag {}: {}", id_tag, e)
+            # Return Invalid status on database error
+            return {"status": "Invalid"}
 
-        return id_tag_info
+        return _id_tag_info(id_tag, tag_record)
 
     async def _generate_transaction_id(self, session):
-        """Generate a unique transaction ID."""
-        # Simple approach: use random number and check for uniqueness
-        # In production, you might use a sequence or UUID
-        while True:
-            transaction_id = random.randint(100000, 999999)
-
-            # Check if this ID already exists
-            result = await session.execute(
-                select(Session).where(Session.transaction_id == transaction_id)
-            )
-            existing = result.scalar_one_or_none()
-
-            if not existing:
-                return transaction_id
+        """Generate a unique transaction ID from the database sequence."""
+        # nextval() never hands out the same value twice, even to concurrent
+        # transactions, so no uniqueness check is needed
+        return await session.scalar(_NEXT_TRANSACTION_ID_STMT)
 
     async def _send_availability_status_notifications(
         self, connector_ids, availability_type
@@ -999,8 +996,10 @@ class ChargePoint(ChargePointV16):
                     info = "Connector set to inoperative"
 
                 logger.info(
-                    f"Sending StatusNotification for connector {connector_id}: "
-                    f"status={status}, availability={availability_type}"
+                    "Sending StatusNotification for connector {}: status={}, availability={}",
+                    connector_id,
+                    status,
+                    availability_type,
                 )
 
                 # Send StatusNotification to inform Central System
@@ -1014,8 +1013,10 @@ class ChargePoint(ChargePointV16):
 
                 await self.call(status_request)
                 logger.info(
-                    f"StatusNotification sent: connector {connector_id} now {status} "
-                    f"(availability: {availability_type})"
+                    "StatusNotification sent: connector {} now {} (availability: {})",
+                    connector_id,
+                    status,
+                    availability_type,
                 )
 
                 # Small delay between notifications
@@ -1023,4 +1024,4 @@ class ChargePoint(ChargePointV16):
                     await asyncio.sleep(0.2)
 
         except Exception as e:
-            logger.error(f"Failed to send availability StatusNotifications: {e}")
+            logger.error("Failed to send availability StatusNotifications: {}", e)
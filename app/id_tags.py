@@ -0,0 +1,150 @@
+"""
+Cached ID tag lookups shared by the OCPP handlers and Central System operations.
+"""
+
+import asyncio
+from loguru import logger
+from sqlalchemy import bindparam, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.cache import TTLCache
+from app.config import (
+    ID_TAG_CACHE_MAXSIZE,
+    ID_TAG_CACHE_TTL,
+    ID_TAG_RELOAD_INTERVAL,
+)
+from app.database import session_scope
+from app.models import IdTag
+from app.utils import utc_now_naive
+
+# Only the columns needed for authorization are selected, which skips ORM
+# entity construction; the asyncpg dialect prepares and caches the statement
+# per connection, so repeat lookups reuse the server-side plan.
+_ID_TAG_COLUMNS = (IdTag.id, IdTag.status, IdTag.expiry_date, IdTag.parent_id_tag)
+_ID_TAG_STMT = select(*_ID_TAG_COLUMNS).where(IdTag.tag == bindparam("tag"))
+# Same lookup for many tags in one round-trip
+_ID_TAG_BULK_STMT = select(IdTag.tag, *_ID_TAG_COLUMNS).where(
+    IdTag.tag.in_(bindparam("tags", expanding=True))
+)
+# Every tag, for preloading the cache
+_ALL_ID_TAGS_STMT = select(IdTag.tag, *_ID_TAG_COLUMNS)
+
+# Tag rows (None for unknown tags); tags change rarely, so repeat Authorize,
+# StartTransaction and RemoteStart calls for the same tag skip the database.
+# Expiry is checked when a row is used, so cached tags still expire on time.
+_id_tag_cache = TTLCache(maxsize=ID_TAG_CACHE_MAXSIZE, ttl=ID_TAG_CACHE_TTL)
+_UNCACHED = object()
+
+# Running reload task, kept so it is not garbage collected
+_reload_task = None
+
+
+async def get_id_tag(tag: str, session: AsyncSession = None):
+    """
+    Look up an ID tag, using the cache when possible.
+
+    Args:
+        tag: ID tag to look up
+        session: Optional database session to reuse on a cache miss
+
+    Returns:
+        Row with id, status, expiry_date and parent_id_tag, or None if the
+        tag is unknown. Database errors are raised to the caller.
+    """
+    tag_record = _id_tag_cache.get(tag, _UNCACHED)
+    if tag_record is _UNCACHED:
+        async with session_scope(session) as session:
+            result = await session.execute(_ID_TAG_STMT, {"tag": tag})
+            tag_record = result.one_or_none()
+        _id_tag_cache.set(tag, tag_record)
+    return tag_record
+
+
+async def get_id_tags(tags, session: AsyncSession = None):
+    """
+    Look up several ID tags, fetching all uncached tags in one query.
+
+    Returns:
+        dict: Row (or None if unknown) per tag, as returned by get_id_tag
+    """
+    records = {}
+    missing = []
+    for tag in dict.fromkeys(tags):
+        tag_record = _id_tag_cache.get(tag, _UNCACHED)
+        if tag_record is _UNCACHED:
+            missing.append(tag)
+        else:
+            records[tag] = tag_record
+
+    if missing:
+        async with session_scope(session) as session:
+            result = await session.execute(_ID_TAG_BULK_STMT, {"tags": missing})
+            found = {row.tag: row for row in result}
+        for tag in missing:
+            records[tag] = found.get(tag)
+            _id_tag_cache.set(tag, records[tag])
+
+    return records
+
+
+def is_expired(tag_record) -> bool:
+    """Return True if the tag row has an expiry date in the past."""
+    return bool(tag_record.expiry_date and tag_record.expiry_date < utc_now_naive())
+
+
+def invalidate_id_tag(tag: str):
+    """Drop a tag's cached row so the next lookup re-reads it."""
+    _id_tag_cache.pop(tag)
+
+
+async def load_id_tags(session: AsyncSession = None):
+    """
+    Load every ID tag into the cache in one query.
+
+    Afterwards, lookups for known tags are served from memory until their
+    cache entries expire.
+
+    Returns:
+        int: Number of tags loaded
+    """
+    async with session_scope(session) as session:
+        result = await session.execute(_ALL_ID_TAGS_STMT)
+        tag_records = result.all()
+
+    for tag_record in tag_records:
+        _id_tag_cache.set(tag_record.tag, tag_record)
+
+    if len(tag_records) > _id_tag_cache.maxsize:
+        logger.warning(
+            "Loaded {} ID tags but the cache holds {}; raise ID_TAG_CACHE_MAXSIZE",
+            len(tag_records),
+            _id_tag_cache.maxsize,
+        )
+    return len(tag_records)
+
+
+async def _reload_id_tags_periodically(interval: float):
+    """Reload all ID tags every interval seconds until cancelled."""
+    while True:
+        try:
+            count = await load_id_tags()
+            logger.debug("Loaded {} ID tags into the cache", count)
+        except Exception as e:
+            logger.error("Failed to load ID tags: {}", e)
+        await asyncio.sleep(interval)
+
+
+def start_id_tag_preloader():
+    """
+    Load all ID tags now and reload them every ID_TAG_RELOAD_INTERVAL seconds.
+
+    Keeping the interval below ID_TAG_CACHE_TTL means known tags never expire
+    from the cache, so Authorize does not touch the database for them. Call
+    once from the server's event loop; a non-positive interval disables it.
+    """
+    global _reload_task
+    if ID_TAG_RELOAD_INTERVAL <= 0 or _reload_task is not None:
+        return
+    _reload_task = asyncio.create_task(
+        _reload_id_tags_periodically(ID_TAG_RELOAD_INTERVAL),
+        name="id-tag-preloader",
+    )
@@ -11,6 +11,8 @@ from ocpp.v16 import ChargePoint as ChargePointV16
 from ocpp.v201 import ChargePoint as ChargePointV201
 from app.handlers.charge_point import ChargePoint
 from app.connection_manager import register_charge_point, unregister_charge_point
+from app.id_tags import start_id_tag_preloader
+from app.writers import start_background_writers, stop_background_writers
 
 # Configure logging
 logger.add(
@@ -19,6 +21,8 @@ logger.add(
     retention="7 days",
     level="INFO",
     format="{time:YYYY-MM-DD HH:mm:ss} | {level} | {message}",
+    # Write from a background thread so file I/O never blocks the event loop
+    enqueue=True,
 )
 
 
@@ -29,7 +33,7 @@ async def on_connect(websocket, path):
         requested_protocols = websocket.request_headers.get(
             "Sec-WebSocket-Protocol", ""
         ).split(",")
-        logger.info(f"Client connected. Requested protocols: {requested_protocols}")
+        logger.info("Client connected. Requested protocols: {}", requested_protocols)
 
         # For now, we'll only support OCPP 1.6
         if "ocpp1.6" in requested_protocols:
@@ -41,10 +45,10 @@ async def on_connect(websocket, path):
 
             await cp.start()
         else:
-            logger.warning(f"Unsupported protocol requested: {requested_protocols}")
+            logger.warning("Unsupported protocol requested: {}", requested_protocols)
             await websocket.close(1002, "Unsupported protocol")
     except Exception as e:
-        logger.error(f"Error handling connection: {e}")
+        logger.error("Error handling connection: {}", e)
         await websocket.close(1011, "Internal error")
     finally:
         # Unregister the charge point when connection closes
@@ -58,8 +62,15 @@ async def main():
         on_connect, "0.0.0.0", 9000, subprotocols=["ocpp1.6"]
     )
 
+    start_background_writers()
+    start_id_tag_preloader()
+
     logger.info("OCPP WebSocket server started on ws://0.0.0.0:9000")
-    await server.wait_closed()
+    try:
+        await server.wait_closed()
+    finally:
+        # Don't lose heartbeats still waiting for the next flush
+        await stop_background_writers()
 
 
 if __name__ == "__main__":
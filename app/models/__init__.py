@@ -1,6 +1,20 @@
 """
 Database models package.
 """
-from .schema import ChargePoint, IdTag, Session, MeterValue, ConnectorStatus
+from .schema import (
+    ChargePoint,
+    IdTag,
+    Session,
+    MeterValue,
+    ConnectorStatus,
+    transaction_id_seq,
+)
 
-__all__ = ["ChargePoint", "IdTag", "Session", "MeterValue", "ConnectorStatus"] 
\ No newline at end of file
+__all__ = [
+    "ChargePoint",
+    "IdTag",
+    "Session",
+    "MeterValue",
+    "ConnectorStatus",
+    "transaction_id_seq",
+] 
\ No newline at end of file
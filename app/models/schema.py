@@ -4,9 +4,29 @@ Database models for OCPP backend.
 
 from datetime import datetime
 from typing import Optional
-from sqlalchemy import String, Integer, DateTime, Boolean, Float, Text, ForeignKey
+from sqlalchemy import (
+    String,
+    Integer,
+    DateTime,
+    Boolean,
+    Float,
+    Text,
+    ForeignKey,
+    Index,
+    Sequence,
+)
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 from app.database import Base
+from app.utils import utc_now_naive, utc_now_sql
+
+# Source of OCPP transaction IDs. Starts above the 6-digit random IDs issued
+# before the sequence existed, so it never collides with them. Registered on
+# the metadata rather than the column so create_all also adds it to
+# databases whose sessions table already exists. Capped at the int32
+# maximum, since OCPP 1.6 transactionId and the column are 32-bit integers.
+transaction_id_seq = Sequence(
+    "transaction_id_seq", start=1000000, maxvalue=2147483647, metadata=Base.metadata
+)
 
 
 class ChargePoint(Base):
@@ -55,9 +75,9 @@ class ChargePoint(Base):
     )  # Accepted, Pending, Rejected
 
     # Timestamps
-    created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
+    created_at: Mapped[datetime] = mapped_column(DateTime, default=utc_now_naive)
     updated_at: Mapped[Optional[datetime]] = mapped_column(
-        DateTime, onupdate=datetime.utcnow
+        DateTime, onupdate=utc_now_sql()
     )
 
     # Relationships
@@ -92,9 +112,9 @@ class IdTag(Base):
     )  # For hierarchical tags
 
     # Timestamps
-    created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
+    created_at: Mapped[datetime] = mapped_column(DateTime, default=utc_now_naive)
     updated_at: Mapped[Optional[datetime]] = mapped_column(
-        DateTime, onupdate=datetime.utcnow
+        DateTime, onupdate=utc_now_sql()
     )
 
     # Relationships
@@ -127,7 +147,7 @@ class Session(Base):
     )  # Ending meter value in Wh
 
     # Timestamps
-    start_timestamp: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
+    start_timestamp: Mapped[datetime] = mapped_column(DateTime, default=utc_now_naive)
     stop_timestamp: Mapped[Optional[datetime]] = mapped_column(DateTime)
 
     # Session status
@@ -146,9 +166,9 @@ class Session(Base):
     reservation_id: Mapped[Optional[int]] = mapped_column(Integer)
 
     # Timestamps
-    created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
+    created_at: Mapped[datetime] = mapped_column(DateTime, default=utc_now_naive)
     updated_at: Mapped[Optional[datetime]] = mapped_column(
-        DateTime, onupdate=datetime.utcnow
+        DateTime, onupdate=utc_now_sql()
     )
 
     # Relationships
@@ -174,7 +194,7 @@ class MeterValue(Base):
     session_id: Mapped[int] = mapped_column(Integer, ForeignKey("sessions.id"))
 
     # Meter data
-    timestamp: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
+    timestamp: Mapped[datetime] = mapped_column(DateTime, default=utc_now_naive)
     value: Mapped[float] = mapped_column(Float)  # The actual meter reading
     unit: Mapped[str] = mapped_column(String(10), default="Wh")  # Wh, kWh, A, V, etc.
     measurand: Mapped[str] = mapped_column(
@@ -192,7 +212,7 @@ class MeterValue(Base):
     format: Mapped[str] = mapped_column(String(10), default="Raw")  # Raw, SignedData
 
     # Timestamps
-    created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
+    created_at: Mapped[datetime] = mapped_column(DateTime, default=utc_now_naive)
 
     # Relationships
     session: Mapped["Session"] = relationship("Session", back_populates="meter_values")
@@ -204,6 +224,17 @@ class ConnectorStatus(Base):
     """
 
     __tablename__ = "connector_statuses"
+    __table_args__ = (
+        # Latest-status lookups filter on (charge_point_id, connector_id) and
+        # take the first row by timestamp descending; a backward scan of this
+        # index returns it without sorting the connector's history
+        Index(
+            "ix_connector_statuses_latest",
+            "charge_point_id",
+            "connector_id",
+            "timestamp",
+        ),
+    )
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
 
@@ -235,7 +266,7 @@ class ConnectorStatus(Base):
     )  # Vendor-specific error
 
     # Tracking fields
-    created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
+    created_at: Mapped[datetime] = mapped_column(DateTime, default=utc_now_naive)
 
     # Relationships
     charge_point: Mapped["ChargePoint"] = relationship("ChargePoint")
@@ -2,7 +2,12 @@
 Utility functions for OCPP compliance and common operations.
 """
 
+import time
 from datetime import datetime, timezone
+from sqlalchemy import func, literal_column
+
+# (epoch second, ISO string) last produced by utc_now_iso_seconds()
+_iso_second_cache = (None, "")
 
 
 def utc_now_iso():
@@ -18,6 +23,25 @@ def utc_now_iso():
     return datetime.now(timezone.utc).isoformat().replace("+00:00", "Z")
 
 
+def utc_now_iso_seconds():
+    """
+    Get current UTC time in ISO format with Z suffix, at one-second precision.
+
+    The string is formatted once per second and reused, which keeps
+    high-frequency responses (Heartbeat, BootNotification currentTime) from
+    formatting a new timestamp for every message.
+
+    Returns:
+        str: Current UTC time in ISO format with Z suffix (e.g., "2024-01-01T12:00:00Z")
+    """
+    global _iso_second_cache
+    second = int(time.time())
+    if second != _iso_second_cache[0]:
+        iso = datetime.fromtimestamp(second, timezone.utc).isoformat()
+        _iso_second_cache = (second, iso.replace("+00:00", "Z"))
+    return _iso_second_cache[1]
+
+
 def utc_now_naive():
     """
     Get current UTC time as timezone-naive datetime for database storage.
@@ -31,6 +55,20 @@ def utc_now_naive():
     return datetime.now(timezone.utc).replace(tzinfo=None)
 
 
+def utc_now_sql():
+    """
+    Get a SQL expression for the current UTC time as a timezone-naive timestamp.
+
+    The database evaluates it, so writes that use it need no Python timestamp
+    parameter and share one clock. now() is the transaction start time, so
+    every use within a transaction gets the same value.
+
+    Returns:
+        SQL expression matching the timezone-naive UTC datetimes we store
+    """
+    return func.timezone(literal_column("'utc'"), func.now())
+
+
 def parse_ocpp_timestamp(timestamp_str):
     """
     Parse an OCPP timestamp string to timezone-naive UTC datetime.
@@ -43,12 +81,19 @@ def parse_ocpp_timestamp(timestamp_str):
     Returns:
         datetime: Timezone-naive UTC datetime for database storage
     """
-    if timestamp_str.endswith("Z"):
-        # Replace Z with +00:00 for parsing
-        timestamp_str = timestamp_str[:-1] + "+00:00"
-
-    # Parse and convert to timezone-naive UTC
-    dt = datetime.fromisoformat(timestamp_str)
+    try:
+        # Python 3.11+ parses the Z suffix natively, without a string copy
+        dt = datetime.fromisoformat(timestamp_str)
+    except ValueError:
+        if not timestamp_str.endswith("Z"):
+            raise
+        # Older Pythons need Z spelled as +00:00
+        dt = datetime.fromisoformat(timestamp_str[:-1] + "+00:00")
+
+    # Convert to timezone-naive UTC
+    if dt.tzinfo is timezone.utc:
+        # Already UTC (Z or +00:00): just drop the tzinfo
+        return dt.replace(tzinfo=None)
     if dt.tzinfo is not None:
         return dt.astimezone(timezone.utc).replace(tzinfo=None)
     else:
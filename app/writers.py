@@ -0,0 +1,462 @@
+"""
+Background writers that batch frequent, non-critical database updates
+off the OCPP message path.
+"""
+
+import asyncio
+from operator import itemgetter
+import asyncpg
+from loguru import logger
+from sqlalchemy import String, any_, bindparam, insert, select, update
+from sqlalchemy.dialects.postgresql import ARRAY, insert as pg_insert
+from sqlalchemy.exc import DataError, IntegrityError, SQLAlchemyError
+from app.cache import TTLCache
+from app.config import (
+    BACKGROUND_WRITE_LIMIT,
+    HEARTBEAT_FLUSH_INTERVAL,
+    LAST_SEEN_WRITE_INTERVAL,
+    METER_VALUE_BATCH_SIZE,
+    METER_VALUE_BATCH_WINDOW,
+    METER_VALUE_QUEUE_SIZE,
+    METER_VALUE_USE_COPY,
+    STATUS_BATCH_SIZE,
+    STATUS_BATCH_WINDOW,
+    STATUS_QUEUE_SIZE,
+)
+from app.database import AsyncSessionLocal, detached_context, engine
+from app.models import ChargePoint as ChargePointModel, ConnectorStatus, MeterValue
+from app.utils import utc_now_naive, utc_now_sql
+
+# Latest heartbeat time per charge point, waiting to be written. Repeat
+# heartbeats from a charge point between flushes overwrite each other, so
+# each flush writes at most one row per charge point.
+_heartbeat_buffer = {}
+
+# Charge points whose last_seen was queued within LAST_SEEN_WRITE_INTERVAL;
+# further heartbeats from them are not written until the entry expires
+_recent_heartbeats = TTLCache(maxsize=10000, ttl=LAST_SEEN_WRITE_INTERVAL)
+# Boot values last stored per charge point, so identical repeat boots
+# within LAST_SEEN_WRITE_INTERVAL are not written again
+_recent_boots = TTLCache(maxsize=10000, ttl=LAST_SEEN_WRITE_INTERVAL)
+
+# Core (not ORM) UPDATE so ids of unknown charge points just match no row.
+# Only last_seen is written: a flush can run after the charge point has
+# disconnected, so is_online is left to register/unregister.
+_HEARTBEAT_UPDATE_STMT = (
+    update(ChargePointModel.__table__)
+    .where(ChargePointModel.id == bindparam("charge_point_id"))
+    .values(last_seen=bindparam("seen_at"))
+)
+
+# Meter value rows from all charge points, waiting to be written. A single
+# consumer task writes them in multi-row INSERTs, so many small MeterValues
+# messages share one round-trip. Producers wait while the queue is full.
+# Created by start_background_writers() on the server's event loop; while
+# no writer runs, rows are written directly.
+_meter_value_queue = None
+_METER_VALUE_INSERT_STMT = insert(MeterValue.__table__)
+# With asyncpg, batches are written with COPY, which skips SQL parsing and
+# per-row parameter binding. COPY bypasses Python-side column defaults, so
+# created_at is sent explicitly.
+_USE_COPY = METER_VALUE_USE_COPY and engine.dialect.driver == "asyncpg"
+_METER_VALUE_COPY_COLUMNS = (
+    "session_id",
+    "timestamp",
+    "value",
+    "unit",
+    "measurand",
+    "phase",
+    "location",
+    "context",
+    "format",
+)
+_meter_value_record = itemgetter(*_METER_VALUE_COPY_COLUMNS)
+
+# StatusNotification rows, written in batches like meter values. Connector 0
+# statuses also update the charge point's overall status, once per charge
+# point per batch.
+_status_queue = None
+_STATUS_INSERT_STMT = insert(ConnectorStatus.__table__)
+# Which of a batch's charge points exist; rows from unknown ones would fail
+# the foreign key. One array parameter keeps the SQL the same for any count.
+_EXISTING_CHARGE_POINTS_STMT = select(ChargePointModel.id).where(
+    ChargePointModel.id == any_(bindparam("charge_point_ids", type_=ARRAY(String)))
+)
+_CHARGE_POINT_STATUS_STMT = (
+    update(ChargePointModel.__table__)
+    .where(ChargePointModel.id == bindparam("charge_point_id"))
+    .values(status=bindparam("new_status"))
+)
+
+# Errors that retrying the same rows can't fix. COPY runs on the raw asyncpg
+# connection, so its errors are not wrapped by SQLAlchemy.
+_BAD_DATA_ERRORS = (
+    IntegrityError,
+    DataError,
+    asyncpg.IntegrityConstraintViolationError,
+    asyncpg.DataError,
+)
+# Attempts for a batch before its rows are dropped, and the delay before the
+# first retry (doubled after each further failure)
+_WRITE_ATTEMPTS = 5
+_RETRY_DELAY = 1.0  # seconds
+
+# Queued last on shutdown; a batch writer writes what it has and exits
+_STOP = object()
+# (queue, task) of each running batch writer
+_batch_writers = []
+
+# Running flush tasks, kept so they are not garbage collected
+_writer_tasks = []
+
+# Caps one-off background writes in flight. Once reached, callers wait for a
+# slot, so a stalled database slows handlers down instead of piling up tasks.
+# Created by start_background_writers(); until then writes run inline.
+_write_slots = None
+_background_writes = set()
+
+
+def record_heartbeat(charge_point_id: str, seen_at):
+    """Queue a charge point's last_seen update for the next flush."""
+    if _recent_heartbeats.get(charge_point_id):
+        return
+    _recent_heartbeats.set(charge_point_id, True)
+    _heartbeat_buffer[charge_point_id] = seen_at
+
+
+def forget_charge_point(charge_point_id: str):
+    """Drop a disconnected charge point's buffered heartbeat and write history."""
+    _heartbeat_buffer.pop(charge_point_id, None)
+    _recent_heartbeats.pop(charge_point_id)
+    _recent_boots.pop(charge_point_id)
+
+
+async def flush_heartbeats():
+    """Write all buffered heartbeats in one transaction."""
+    global _heartbeat_buffer
+    if not _heartbeat_buffer:
+        return
+
+    pending, _heartbeat_buffer = _heartbeat_buffer, {}
+    try:
+        async with AsyncSessionLocal() as session:
+            # One executemany round-trip for the whole batch
+            await session.execute(
+                _HEARTBEAT_UPDATE_STMT,
+                [
+                    {"charge_point_id": charge_point_id, "seen_at": seen_at}
+                    for charge_point_id, seen_at in pending.items()
+                ],
+            )
+            await session.commit()
+        logger.debug("Flushed {} heartbeat updates", len(pending))
+    except Exception as e:
+        logger.error("Failed to flush {} heartbeat updates: {}", len(pending), e)
+        # Retry next time, unless a newer heartbeat has arrived meanwhile
+        for charge_point_id, seen_at in pending.items():
+            _heartbeat_buffer.setdefault(charge_point_id, seen_at)
+
+
+async def queue_meter_values(rows):
+    """Queue meter value rows for the next batch INSERT."""
+    if _meter_value_queue is None:
+        # No batch writer running (e.g. a script): write directly
+        if rows:
+            await _write_rows(rows, *_METER_VALUE_WRITER)
+        return
+    for row in rows:
+        await _meter_value_queue.put(row)
+
+
+async def _write_meter_values(rows):
+    """Write meter value rows in one transaction."""
+    async with AsyncSessionLocal() as session:
+        if _USE_COPY:
+            await _copy_meter_values(session, rows)
+        else:
+            await session.execute(_METER_VALUE_INSERT_STMT, rows)
+        await session.commit()
+    logger.debug("Stored {} meter values", len(rows))
+
+
+async def _copy_meter_values(session, rows):
+    """Write meter value rows with COPY on the session's asyncpg connection."""
+    connection = await session.connection()
+    raw_connection = await connection.get_raw_connection()
+    created_at = (utc_now_naive(),)
+    await raw_connection.driver_connection.copy_records_to_table(
+        MeterValue.__tablename__,
+        records=[_meter_value_record(row) + created_at for row in rows],
+        columns=(*_METER_VALUE_COPY_COLUMNS, "created_at"),
+    )
+
+
+async def queue_connector_status(row: dict):
+    """Queue a StatusNotification row for the next batch INSERT."""
+    if _status_queue is None:
+        # No batch writer running (e.g. a script): write directly
+        await _write_rows([row], *_STATUS_WRITER)
+        return
+    await _status_queue.put(row)
+
+
+async def _write_connector_statuses(rows):
+    """Write StatusNotification rows and charge point statuses in one transaction."""
+    async with AsyncSessionLocal() as session:
+        known_ids = set(
+            await session.scalars(
+                _EXISTING_CHARGE_POINTS_STMT,
+                {"charge_point_ids": list({row["charge_point_id"] for row in rows})},
+            )
+        )
+        unknown = [row for row in rows if row["charge_point_id"] not in known_ids]
+        if unknown:
+            logger.warning(
+                "Skipping {} StatusNotifications from unknown charge points: {}",
+                len(unknown),
+                sorted({row["charge_point_id"] for row in unknown}),
+            )
+            rows = [row for row in rows if row["charge_point_id"] in known_ids]
+            if not rows:
+                return
+
+        # Latest connector 0 status per charge point; later rows win
+        charge_point_statuses = {
+            row["charge_point_id"]: row["status"]
+            for row in rows
+            if row["connector_id"] == 0
+        }
+        await session.execute(_STATUS_INSERT_STMT, rows)
+        if charge_point_statuses:
+            await session.execute(
+                _CHARGE_POINT_STATUS_STMT,
+                [
+                    {"charge_point_id": charge_point_id, "new_status": status}
+                    for charge_point_id, status in charge_point_statuses.items()
+                ],
+            )
+        await session.commit()
+    logger.debug("Stored {} StatusNotifications", len(rows))
+
+
+# (write, group_key, label) of each batch writer; a failed batch is retried
+# per group_key value
+_METER_VALUE_WRITER = (_write_meter_values, "session_id", "meter values")
+_STATUS_WRITER = (_write_connector_statuses, "charge_point_id", "StatusNotifications")
+
+
+async def _write_groups(rows, write, group_key: str, label: str):
+    """
+    Write each group of rows sharing row[group_key] in its own transaction.
+
+    Groups rejected for bad data are logged and dropped. On any other error
+    (e.g. a lost connection) the remaining groups are not tried, and all
+    unwritten rows are returned for a later retry.
+    """
+    groups = {}
+    for row in rows:
+        groups.setdefault(row[group_key], []).append(row)
+
+    unwritten = []
+    for key, group in groups.items():
+        if unwritten:
+            unwritten.extend(group)
+            continue
+        try:
+            await write(group)
+        except _BAD_DATA_ERRORS as e:
+            logger.error(
+                "Dropped {} {} for {} {}: {}", len(group), label, group_key, key, e
+            )
+        except Exception as e:
+            logger.warning("Failed to store {} {}: {}", len(group), label, e)
+            unwritten.extend(group)
+    return unwritten
+
+
+async def _write_rows(rows, write, group_key: str, label: str):
+    """
+    Write a batch of rows with write(rows) without losing it to one failure.
+
+    If the batch fails, it is split by group_key (e.g. per session or charge
+    point) so one bad group can't discard the others, and rows that failed
+    for other reasons are retried with backoff.
+    """
+    delay = _RETRY_DELAY
+    for attempt in range(1, _WRITE_ATTEMPTS + 1):
+        try:
+            await write(rows)
+            return
+        except Exception as e:
+            logger.warning(
+                "Failed to store {} {} (attempt {}): {}", len(rows), label, attempt, e
+            )
+
+        rows = await _write_groups(rows, write, group_key, label)
+        if not rows:
+            return
+        if attempt < _WRITE_ATTEMPTS:
+            await asyncio.sleep(delay)
+            delay *= 2
+
+    logger.error("Dropped {} {} after {} attempts", len(rows), label, _WRITE_ATTEMPTS)
+
+
+async def _write_batches(
+    queue, write, group_key: str, label: str, batch_size: int, window: float
+):
+    """Pass rows from queue to write in batches until _STOP is queued."""
+    running = True
+    while running:
+        rows = [await queue.get()]
+        # Give other charge points a moment to add to a batch that isn't full
+        if rows[0] is not _STOP and queue.qsize() < batch_size:
+            await asyncio.sleep(window)
+        while len(rows) < batch_size and not queue.empty():
+            rows.append(queue.get_nowait())
+
+        # _STOP is queued after every row, so it can only come last
+        if rows[-1] is _STOP:
+            rows.pop()
+            running = False
+        if rows:
+            await _write_rows(rows, write, group_key, label)
+
+
+def boot_recently_persisted(charge_point_id: str, boot_values: dict) -> bool:
+    """Return True if these boot values were stored for the charge point recently."""
+    return _recent_boots.get(charge_point_id) == boot_values
+
+
+async def persist_boot_notification(charge_point_id: str, boot_values: dict):
+    """
+    Store BootNotification data for a charge point with a single upsert.
+
+    Runs after the response, possibly once the charge point has disconnected,
+    so is_online is left to register/unregister.
+    """
+    insert_stmt = pg_insert(ChargePointModel).values(
+        id=charge_point_id, last_seen=utc_now_sql(), **boot_values
+    )
+    stmt = insert_stmt.on_conflict_do_update(
+        index_elements=[ChargePointModel.id],
+        set_={
+            **{column: insert_stmt.excluded[column] for column in boot_values},
+            "last_seen": insert_stmt.excluded.last_seen,
+            # onupdate defaults don't apply to ON CONFLICT, so set it here
+            "updated_at": utc_now_sql(),
+        },
+    )
+
+    # Own session: this runs after the message's shared session is closed
+    async with AsyncSessionLocal() as session:
+        try:
+            await session.execute(stmt)
+            await session.commit()
+            _recent_boots.set(charge_point_id, boot_values)
+            logger.debug(
+                "BootNotification data stored in database for {}", charge_point_id
+            )
+        except SQLAlchemyError as e:
+            logger.error("Failed to store BootNotification data: {}", e)
+            await session.rollback()
+
+
+async def run_in_background(write, *args):
+    """
+    Run write(*args) as a background task, off the caller's response path.
+
+    Only waits when BACKGROUND_WRITE_LIMIT writes are already in flight.
+    Without running background writers, the write runs inline instead.
+    """
+    write_slots = _write_slots
+    if write_slots is None:
+        await _run_write(write, args)
+        return
+
+    await write_slots.acquire()
+    # Spawned from OCPP handlers, which run inside shared_session()
+    task = asyncio.create_task(
+        _run_write(write, args, write_slots), context=detached_context()
+    )
+    _background_writes.add(task)
+    task.add_done_callback(_background_writes.discard)
+
+
+async def _run_write(write, args, write_slots=None):
+    """Run a background write, logging failures and releasing its slot."""
+    try:
+        await write(*args)
+    except Exception as e:
+        logger.error("Background write {} failed: {}", write.__name__, e)
+    finally:
+        if write_slots is not None:
+            write_slots.release()
+
+
+async def _run_periodically(flush, interval: float):
+    """Call flush every interval seconds until cancelled."""
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            await flush()
+        except Exception as e:
+            logger.error("Background writer {} failed: {}", flush.__name__, e)
+
+
+def start_background_writers():
+    """Start the background writer tasks; call once from the server's event loop."""
+    global _meter_value_queue, _status_queue, _write_slots
+    if _write_slots is not None:
+        return
+
+    # Created here rather than at import so they belong to the running loop
+    _write_slots = asyncio.Semaphore(BACKGROUND_WRITE_LIMIT)
+    _meter_value_queue = asyncio.Queue(maxsize=METER_VALUE_QUEUE_SIZE)
+    _status_queue = asyncio.Queue(maxsize=STATUS_QUEUE_SIZE)
+    for queue, writer, batch_size, window, name in (
+        (
+            _meter_value_queue,
+            _METER_VALUE_WRITER,
+            METER_VALUE_BATCH_SIZE,
+            METER_VALUE_BATCH_WINDOW,
+            "meter-value-writer",
+        ),
+        (
+            _status_queue,
+            _STATUS_WRITER,
+            STATUS_BATCH_SIZE,
+            STATUS_BATCH_WINDOW,
+            "status-writer",
+        ),
+    ):
+        task = asyncio.create_task(
+            _write_batches(queue, *writer, batch_size, window), name=name
+        )
+        _batch_writers.append((queue, task))
+    _writer_tasks.append(
+        asyncio.create_task(
+            _run_periodically(flush_heartbeats, HEARTBEAT_FLUSH_INTERVAL),
+            name="heartbeat-flusher",
+        )
+    )
+
+
+async def stop_background_writers():
+    """Stop the background writer tasks and write whatever is still buffered."""
+    global _meter_value_queue, _status_queue, _write_slots
+    for task in _writer_tasks:
+        task.cancel()
+    await asyncio.gather(*_writer_tasks, return_exceptions=True)
+    _writer_tasks.clear()
+
+    # Let in-flight background writes finish, then flush what remains
+    await asyncio.gather(*_background_writes, return_exceptions=True)
+    for queue, task in _batch_writers:
+        await queue.put(_STOP)
+        await task
+    _batch_writers.clear()
+    await flush_heartbeats()
+
+    # Later writes (e.g. from another event loop) go straight to the database
+    _meter_value_queue = _status_queue = _write_slots = None
@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+"""
+Test the in-process TTL cache used for hot read paths.
+
+This test verifies that:
+1. Entries expire after their TTL
+2. The cache is bounded by maxsize
+3. Concurrent misses share a single computation
+"""
+
+import sys
+import os
+import asyncio
+import time
+
+# Add the parent directory to the path so we can import from app
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.cache import TTLCache
+
+
+def test_get_and_expiry():
+    """Test that cached values are returned until their TTL elapses."""
+    print("⏱️  Testing TTL expiry...")
+
+    cache = TTLCache(maxsize=10, ttl=0.05)
+    cache.set("CP001", {"status": "Available"})
+    assert cache.get("CP001") == {"status": "Available"}
+
+    time.sleep(0.06)
+    assert cache.get("CP001") is None, "Entry should expire after TTL"
+    assert len(cache) == 0, "Expired entry should be dropped on read"
+
+    # None is a valid cached value and distinct from a miss
+    cache.set("UNKNOWN", None)
+    assert cache.get("UNKNOWN", "miss") is None
+
+    print("  ✅ Entries expire after TTL")
+
+
+def test_maxsize_eviction():
+    """Test that the oldest entry is evicted once maxsize is reached."""
+    print("\n📦 Testing maxsize eviction...")
+
+    cache = TTLCache(maxsize=2, ttl=60)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.set("c", 3)
+
+    assert len(cache) == 2
+    assert cache.get("a") is None, "Oldest entry should be evicted"
+    assert cache.get("b") == 2 and cache.get("c") == 3
+
+    assert cache.pop("b") == 2
+    cache.clear()
+    assert len(cache) == 0
+
+    print("  ✅ Cache stays bounded")
+
+
+def test_get_or_compute_single_flight():
+    """Test that concurrent misses only compute the value once."""
+    print("\n🔁 Testing single-flight computation...")
+
+    cache = TTLCache(maxsize=10, ttl=60)
+    calls = []
+
+    async def compute():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return 42
+
+    async def run():
+        results = await asyncio.gather(
+            *(cache.get_or_compute("stats", compute) for _ in range(5))
+        )
+        cached = await cache.get_or_compute("stats", compute)
+        return results, cached
+
+    results, cached = asyncio.run(run())
+    assert results == [42] * 5
+    assert cached == 42
+    assert len(calls) == 1, f"Expected one computation, got {len(calls)}"
+
+    print("  ✅ Concurrent misses share one computation")
+
+
+if __name__ == "__main__":
+    test_get_and_expiry()
+    test_maxsize_eviction()
+    test_get_or_compute_single_flight()
+    print("\n🎉 All cache tests passed!")
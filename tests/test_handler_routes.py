@@ -0,0 +1,54 @@
+#!/usr/bin/env python3
+"""
+Test the OCPP handler route registration.
+
+This test verifies that:
+1. Each OCPP action has exactly one @on handler
+2. The core Charge Point initiated actions are routed
+"""
+
+import sys
+import os
+from collections import Counter
+
+# Add the parent directory to the path so we can import from app
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.handlers.charge_point import ChargePoint
+
+
+def _on_actions():
+    """Return the action of every @on handler defined on ChargePoint."""
+    actions = []
+    for name in dir(ChargePoint):
+        action = getattr(getattr(ChargePoint, name), "_on_action", None)
+        if action is not None:
+            actions.append(action)
+    return actions
+
+
+def test_each_action_routed_once():
+    """Test that no OCPP action is registered by more than one handler."""
+    print("🧭 Testing handler route registration...")
+
+    counts = Counter(_on_actions())
+    duplicates = {action: count for action, count in counts.items() if count > 1}
+    assert not duplicates, f"Actions with more than one handler: {duplicates}"
+
+    for action in [
+        "BootNotification",
+        "Heartbeat",
+        "Authorize",
+        "StartTransaction",
+        "StopTransaction",
+        "MeterValues",
+        "StatusNotification",
+    ]:
+        assert counts[action] == 1, f"{action} should have exactly one handler"
+
+    print(f"  ✅ {len(counts)} actions, each with a single handler")
+
+
+if __name__ == "__main__":
+    test_each_action_routed_once()
+    print("\n🎉 All handler route tests passed!")
@@ -16,7 +16,12 @@ from datetime import datetime, timezone
 # Add the parent directory to the path so we can import from app
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from app.utils import utc_now_iso, utc_now_naive, parse_ocpp_timestamp
+from app.utils import (
+    utc_now_iso,
+    utc_now_iso_seconds,
+    utc_now_naive,
+    parse_ocpp_timestamp,
+)
 
 
 def test_utc_iso_format():
@@ -36,6 +41,23 @@ def test_utc_iso_format():
     print("  ✅ UTC ISO format is OCPP compliant")
 
 
+def test_utc_iso_seconds_format():
+    """Test that utc_now_iso_seconds() returns a second-precision UTC timestamp."""
+    print("\n⏲️  Testing cached per-second UTC ISO format...")
+
+    iso_time = utc_now_iso_seconds()
+    print(f"  Generated timestamp: {iso_time}")
+
+    assert iso_time.endswith("Z"), f"Timestamp should end with Z, got: {iso_time}"
+    parsed = parse_ocpp_timestamp(iso_time)
+    assert parsed.microsecond == 0, "Timestamp should have second precision"
+
+    time_diff = (utc_now_naive() - parsed).total_seconds()
+    assert 0 <= time_diff < 2, f"Time difference too large: {time_diff} seconds"
+
+    print("  ✅ Per-second UTC ISO format is OCPP compliant")
+
+
 def test_utc_naive_format():
     """Test that utc_now_naive() returns timezone-naive UTC datetime."""
     print("\n🗄️  Testing UTC naive format for database...")
@@ -153,6 +175,7 @@ def main():
 
     try:
         test_utc_iso_format()
+        test_utc_iso_seconds_format()
         test_utc_naive_format()
         test_timestamp_parsing()
         test_timezone_consistency()